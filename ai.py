@@ -0,0 +1,889 @@
+import concurrent.futures
+import heapq
+import os
+import random
+import time
+
+from bitboard import BitBoardModel
+
+# what the density targeter knows about each cell
+UNKNOWN = 0
+BLOCKED = 1 # a miss, a cell of a sunk ship, or a cell next to a sunk ship
+OPEN_HIT = 2 # a hit on a ship that hasn't been sunk yet
+
+
+# the possible ship positions worked out by DensityTargeter.list_positions,
+# keyed by (grid size, ship lengths)
+position_tables = {}
+
+
+class DensityTargeter:
+
+    def __init__(self, grid_size=10, fleet_lengths=(5, 4, 3, 3, 2),
+                 rng=random, time_limit=0.01, table_limit=32):
+        """Sets up a strategy that guesses the cell covered by the most
+        possible positions of the ships that are still afloat.
+        On grids up to table_limit wide every possible ship position is kept
+        in a table and the counts are updated after each shot. On bigger
+        grids the counts are worked out for a sample of cells, taking no
+        more than time_limit seconds per guess.
+        """
+
+        self.grid_size = grid_size
+        self.size = grid_size * grid_size
+        self.rng = rng
+        self.time_limit = time_limit
+
+        # how many ships of each length are still afloat
+        self.remaining = {}
+        for length in fleet_lengths:
+            if length <= grid_size:
+                self.remaining[length] = self.remaining.get(length, 0) + 1
+
+        self.state = bytearray(self.size)
+        self.open_hits = set()
+
+        # visit cells in a random order so ties are broken randomly. a big
+        # grid is only ever sampled, so random cells are drawn as they are
+        # needed instead of shuffling every cell
+        self.tables = grid_size <= table_limit
+        if self.tables:
+            self.order = list(range(self.size))
+            rng.shuffle(self.order)
+            self.rank = [0] * self.size
+            for k, i in enumerate(self.order):
+                self.rank[i] = k
+            self.build_tables()
+        else:
+            self.order = None
+
+    def build_tables(self):
+        """Sets up the table of every possible position of every ship length
+        and the counts of how many positions cover each cell.
+        The positions never change, so they are only listed once for each
+        grid size and set of lengths and shared by every targeter. Only the
+        counts belong to this one.
+        """
+
+        key = (self.grid_size, tuple(sorted(self.remaining)))
+        if key not in position_tables:
+            position_tables[key] = self.list_positions()
+
+        (self.placement_cells, self.placement_length, self.covering,
+         self.touching, hunt) = position_tables[key]
+
+        self.alive = bytearray(b'\x01') * len(self.placement_cells)
+        self.hits_covered = bytearray(len(self.placement_cells))
+
+        # for each length, how many positions cover each cell (hunt), and
+        # how many hits are covered by positions covering each cell (target)
+        self.hunt = {length: list(counts) for length, counts in hunt.items()}
+        self.target = {length: [0] * self.size for length in hunt}
+
+        # a heap of (-score, rank in order, cell) with an entry for every
+        # cell that may be the best, made from the counts in use. scores
+        # that have gone down since their entry was pushed are fixed when
+        # the entry comes to the top, and scores that go up are pushed
+        # again, so the best cell never has to be found by looking at every
+        # cell. it is made again when the counts in use or the ships
+        # afloat change
+        self.heap = None
+        self.heap_counts = None
+
+    def list_positions(self):
+        """Lists every possible position of every ship length still afloat.
+        Returns the cells each position covers, its length, the positions
+        covering each cell, the positions that have each cell right next to
+        them, and how many positions of each length cover each cell.
+        """
+
+        gs = self.grid_size
+
+        placement_cells = []
+        placement_length = []
+        covering = [[] for _ in range(self.size)]
+        touching = [[] for _ in range(self.size)]
+        hunt = {}
+
+        for length in self.remaining:
+            counts = [0] * self.size
+            hunt[length] = counts
+
+            for horizontal in (True, False):
+                columns = gs - length + 1 if horizontal else gs
+                rows = gs if horizontal else gs - length + 1
+                step = gs if horizontal else 1
+
+                for c in range(columns):
+                    for r in range(rows):
+                        p = len(placement_cells)
+                        start = c * gs + r
+                        cells = tuple(range(start, start + step * length,
+                                            step))
+
+                        placement_cells.append(cells)
+                        placement_length.append(length)
+
+                        for i in cells:
+                            covering[i].append(p)
+                            counts[i] += 1
+                        for i in self.ring(c, r, length, horizontal):
+                            touching[i].append(p)
+
+        return placement_cells, placement_length, covering, touching, hunt
+
+    def ring(self, column, row, length, horizontal):
+        """Returns a list of the cells right next to a ship position that are
+        on the board.
+        """
+
+        gs = self.grid_size
+        if horizontal:
+            last_column, last_row = column + length - 1, row
+        else:
+            last_column, last_row = column, row + length - 1
+
+        cells = []
+        for c in range(column - 1, last_column + 2):
+            for r in range(row - 1, last_row + 2):
+                if (0 <= c < gs and 0 <= r < gs
+                        and not (column <= c <= last_column
+                                 and row <= r <= last_row)):
+                    cells.append(c * gs + r)
+
+        return cells
+
+    def kill(self, p):
+        """Takes a position out of the counts because it is no longer
+        possible.
+        """
+
+        if self.alive[p]:
+            self.alive[p] = 0
+            length = self.placement_length[p]
+            hunt = self.hunt[length]
+            target = self.target[length]
+            hits = self.hits_covered[p]
+
+            for i in self.placement_cells[p]:
+                hunt[i] -= 1
+                target[i] -= hits
+
+    def mark_blocked(self, i):
+        """Records that no ship that is still afloat can be in a cell."""
+
+        if self.state[i] != BLOCKED:
+            self.state[i] = BLOCKED
+            self.open_hits.discard(i)
+            if self.tables:
+                for p in self.covering[i]:
+                    self.kill(p)
+
+    def mark_hit(self, i):
+        """Records a hit on a ship that hasn't been sunk yet."""
+
+        self.state[i] = OPEN_HIT
+        self.open_hits.add(i)
+
+        if self.tables:
+            raised = set()
+            for p in self.covering[i]:
+                self.hits_covered[p] += 1
+                if self.alive[p]:
+                    cells = self.placement_cells[p]
+                    target = self.target[self.placement_length[p]]
+                    for j in cells:
+                        target[j] += 1
+                    raised.update(cells)
+
+            if self.heap_counts is self.target:
+                for j in raised:
+                    heapq.heappush(self.heap, (-self.cell_score(j, self.target),
+                                               self.rank[j], j))
+
+            # ships can't touch, so a position right next to a hit must
+            # cover it
+            for p in self.touching[i]:
+                self.kill(p)
+
+    def observe(self, column, row, ship):
+        """Updates what is known about the board after a guess. ship is the
+        ship that was hit, or None for a miss.
+        """
+
+        gs = self.grid_size
+        i = column * gs + row
+
+        if ship == None:
+            self.mark_blocked(i)
+            return
+
+        self.mark_hit(i)
+
+        if ship.sunk:
+            if ship.length in self.remaining:
+                self.remaining[ship.length] -= 1
+                if self.remaining[ship.length] == 0:
+                    del self.remaining[ship.length]
+                self.heap_counts = None
+
+            # the ship and every cell around it are out of play
+            for cell in ship.cells:
+                self.mark_blocked(cell)
+            for cell in ship.halo:
+                self.mark_blocked(cell)
+
+    def choose(self, board):
+        """Returns the column and row of the cell to guess next."""
+
+        if self.tables:
+            i = self.choose_from_tables(board)
+        else:
+            i = self.choose_by_sampling(board)
+
+        if i == None:
+            # nothing fits what is known, so fall back to any open cell
+            i = self.any_open_cell(board)
+
+        return divmod(i, self.grid_size)
+
+    def poll(self, board):
+        """Returns the next move straight away. (Strategies that think in the
+        background return None from poll until they are done.)
+        """
+
+        return self.choose(board)
+
+    def cell_score(self, i, counts):
+        """Returns the count of a cell in a set of counts, weighted by how
+        many ships of each length are afloat.
+        """
+
+        score = 0
+        for length, n in self.remaining.items():
+            score += counts[length][i] * n
+        return score
+
+    def choose_from_tables(self, board):
+        """Returns the unguessed cell with the highest count, using the hit
+        counts while there is a ship that has been hit but not sunk. Ties go
+        to the cell that comes first in the random order.
+        """
+
+        counts = self.target if self.open_hits else self.hunt
+        if self.heap_counts is not counts:
+            self.heap = []
+            for i in range(self.size):
+                score = self.cell_score(i, counts)
+                if score > 0:
+                    self.heap.append((-score, self.rank[i], i))
+            heapq.heapify(self.heap)
+            self.heap_counts = counts
+
+        heap = self.heap
+        guessed = board.guessed
+        while heap:
+            negative, rank, i = heap[0]
+            if not guessed[i]:
+                score = self.cell_score(i, counts)
+                if score == -negative:
+                    return i
+                if score > 0:
+                    heapq.heapreplace(heap, (-score, rank, i))
+                    continue
+            heapq.heappop(heap)
+
+        return None
+
+    def score(self, i, targeting, deadline=None):
+        """Counts the possible positions of the remaining ships that cover a
+        cell. While targeting, each position counts once for every hit it
+        covers. Returns None if the perf_counter deadline passes before it is
+        done.
+        """
+
+        gs = self.grid_size
+        state = self.state
+        column, row = divmod(i, gs)
+        total = 0
+
+        for length, n in self.remaining.items():
+            for horizontal in (True, False):
+                if deadline != None and time.perf_counter() >= deadline:
+                    return None
+                for k in range(length):
+                    if horizontal:
+                        c, r = column - k, row
+                        if c < 0 or c + length > gs:
+                            continue
+                        step = gs
+                    else:
+                        c, r = column, row - k
+                        if r < 0 or r + length > gs:
+                            continue
+                        step = 1
+
+                    start = c * gs + r
+                    hits = 0
+                    possible = True
+                    for j in range(start, start + step * length, step):
+                        if state[j] == BLOCKED:
+                            possible = False
+                            break
+                        if state[j] == OPEN_HIT:
+                            hits += 1
+
+                    if possible and self.open_hits:
+                        for j in self.ring(c, r, length, horizontal):
+                            if state[j] == OPEN_HIT:
+                                possible = False
+                                break
+
+                    if possible:
+                        total += n * (hits if targeting else 1)
+
+        return total
+
+    def choose_by_sampling(self, board):
+        """Scores cells until the time limit runs out and returns the best.
+        While targeting, the cells in line with each hit are scored.
+        Otherwise random unguessed cells are scored.
+        """
+
+        deadline = time.perf_counter() + self.time_limit
+        gs = self.grid_size
+        guessed = board.guessed
+        targeting = len(self.open_hits) > 0
+
+        if targeting:
+            reach = max(self.remaining, default=1)
+            candidates = set()
+            for i in self.open_hits:
+                column, row = divmod(i, gs)
+                for k in range(1, reach):
+                    for c, r in ((column - k, row), (column + k, row),
+                                 (column, row - k), (column, row + k)):
+                        if 0 <= c < gs and 0 <= r < gs:
+                            candidates.add(c * gs + r)
+            candidates = [i for i in candidates if not guessed[i]]
+            self.rng.shuffle(candidates)
+        else:
+            candidates = None
+
+        # always start scoring one cell, then stop at the deadline, even part
+        # way through a cell. if no cell scored anything choose() falls back
+        # to any open cell
+        best = None
+        best_score = 0
+        tries = 0
+        while tries == 0 or time.perf_counter() < deadline:
+            if candidates != None:
+                if tries == len(candidates):
+                    break
+                i = candidates[tries]
+            else:
+                if tries == self.size:
+                    break
+                i = self.rng.randrange(self.size)
+                if guessed[i]:
+                    tries += 1
+                    continue
+
+            score = self.score(i, targeting, deadline)
+            if score == None:
+                break
+            if score > best_score:
+                best = i
+                best_score = score
+            tries += 1
+
+        return best
+
+    def any_open_cell(self, board):
+        """Returns a random cell that hasn't been guessed."""
+
+        guessed = board.guessed
+        if self.order != None:
+            for i in self.order:
+                if not guessed[i]:
+                    return i
+            raise ValueError('every cell has been guessed')
+
+        # try a few random cells, then take the first open one after a random
+        # cell in case nearly every cell has been guessed
+        for _ in range(100):
+            i = self.rng.randrange(self.size)
+            if not guessed[i]:
+                return i
+        start = self.rng.randrange(self.size)
+        i = guessed.find(0, start)
+        if i < 0:
+            i = guessed.find(0)
+        if i < 0:
+            raise ValueError('every cell has been guessed')
+        return i
+
+
+# the process pool shared by every MonteCarloTargeter, made on first use
+pool = None
+
+# a BitBoardModel for each grid size, kept by each worker process so it
+# doesn't need to be rebuilt for every batch of samples
+sampling_boards = {}
+
+
+def get_pool():
+    """Returns the shared process pool, starting it if needed."""
+
+    global pool
+    if pool == None:
+        pool = concurrent.futures.ProcessPoolExecutor(os.cpu_count())
+    return pool
+
+
+def shutdown_pool():
+    """Stops the shared process pool if it was started."""
+
+    global pool
+    if pool != None:
+        pool.shutdown(cancel_futures=True)
+        pool = None
+
+
+def sample_layouts(grid_size, lengths, blocked, hits, samples, seed):
+    """Makes random layouts of ships with the given lengths that fit what is
+    known about a board. blocked is a BitBoardModel mask of cells no ship can
+    be in, and hits is a mask of hits on ships that haven't been sunk. Every
+    hit is covered by a ship and no ship touches a hit it doesn't cover.
+    Returns a dictionary of how many layouts covered each flat cell index,
+    and how many layouts were made. (Runs in a worker process.)
+    """
+
+    if grid_size not in sampling_boards:
+        sampling_boards[grid_size] = BitBoardModel(grid_size)
+    board = sampling_boards[grid_size]
+
+    rng = random.Random(seed)
+    stride = board.stride
+    full = board.full
+    counts = {}
+    made = 0
+
+    for _ in range(samples):
+        occupied = 0
+        uncovered = hits
+        remaining = list(lengths)
+        failed = False
+
+        # first put a ship through each hit that isn't covered yet
+        while uncovered and not failed:
+            target = (uncovered & -uncovered).bit_length() - 1
+            taken = board.spread(occupied) | blocked
+
+            options = []
+            for n, length in enumerate(remaining):
+                for horizontal in (True, False):
+                    step = stride if horizontal else 1
+                    for k in range(length):
+                        anchor = target - k * step
+                        if (anchor < 0 or not (board.in_bounds_anchors[
+                                length, horizontal] >> anchor) & 1):
+                            continue
+                        if horizontal:
+                            shape = board.horizontal_shapes[length] << anchor
+                        else:
+                            shape = board.vertical_shapes[length] << anchor
+                        if shape & taken:
+                            continue
+                        if board.spread(shape) & ~shape & hits:
+                            continue
+                        options.append((n, shape))
+
+            if options:
+                n, shape = rng.choice(options)
+                occupied |= shape
+                uncovered &= ~shape
+                del remaining[n]
+            else:
+                failed = True
+
+        # then put the other ships anywhere they fit
+        for length in remaining:
+            if failed:
+                break
+            taken = board.spread(occupied | hits) | blocked
+            across = board.legal_mask(length, True, taken)
+            down = board.legal_mask(length, False, taken)
+            across_count = across.bit_count()
+            total = across_count + down.bit_count()
+            if not total:
+                failed = True
+                break
+
+            k = rng.randrange(total)
+            horizontal = k < across_count
+            if horizontal:
+                mask = across
+            else:
+                mask = down
+                k -= across_count
+            for _ in range(k):
+                mask &= mask - 1
+            anchor = (mask & -mask).bit_length() - 1
+
+            if horizontal:
+                occupied |= board.horizontal_shapes[length] << anchor
+            else:
+                occupied |= board.vertical_shapes[length] << anchor
+
+        if failed:
+            continue
+
+        made += 1
+        cells = occupied & ~hits & full
+        while cells:
+            low = cells & -cells
+            bit = low.bit_length() - 1
+            counts[bit] = counts.get(bit, 0) + 1
+            cells ^= low
+
+    # turn bit positions into flat cell indexes
+    flat_counts = {}
+    for bit, count in counts.items():
+        column, row = divmod(bit, stride)
+        flat_counts[column * grid_size + row] = count
+
+    return flat_counts, made
+
+
+class MonteCarloTargeter:
+
+    def __init__(self, grid_size=10, fleet_lengths=(5, 4, 3, 3, 2),
+                 rng=random, time_limit=0.25, max_samples=None,
+                 samples_per_task=100, executor=None):
+        """Sets up a strategy that makes lots of random layouts that fit what
+        is known about the board, spread over a pool of processes, and
+        guesses the cell covered by the most of them. It stops sampling after
+        time_limit seconds, or once it has max_samples layouts, and uses what
+        it has so far. If no layouts were made in time it falls back to a
+        DensityTargeter. Uses the shared process pool unless another
+        executor is given.
+        """
+
+        self.grid_size = grid_size
+        self.rng = rng
+        self.time_limit = time_limit
+        self.max_samples = max_samples
+        self.samples_per_task = samples_per_task
+        self.executor = executor
+
+        # keep two batches per CPU queued so no worker is ever idle
+        self.batches = 2 * (os.cpu_count() or 1)
+
+        self.lengths = [length for length in fleet_lengths
+                        if length <= grid_size]
+        self.masks = BitBoardModel(grid_size)
+        self.blocked = 0
+        self.hits = 0
+
+        # keeps the counts used when sampling doesn't finish in time
+        self.fallback = DensityTargeter(grid_size, fleet_lengths, rng)
+
+        self.futures = []
+        self.deadline = None
+        self.counts = {}
+        self.made = 0
+
+    def observe(self, column, row, ship):
+        """Updates what is known about the board after a guess. ship is the
+        ship that was hit, or None for a miss.
+        """
+
+        self.fallback.observe(column, row, ship)
+
+        bit = self.masks.bit(column, row)
+        if ship == None:
+            self.blocked |= bit
+            return
+
+        self.hits |= bit
+        if ship.sunk:
+            # the sunk ship and every cell around it are out of play
+            ship_mask = 0
+            for i in ship.cells:
+                ship_mask |= self.masks.bit(*divmod(i, self.grid_size))
+            self.hits &= ~ship_mask
+            self.blocked |= self.masks.spread(ship_mask)
+            if ship.length in self.lengths:
+                self.lengths.remove(ship.length)
+
+    def submit(self):
+        """Hands another batch of sampling to the process pool."""
+
+        executor = self.executor
+        if executor == None:
+            executor = get_pool()
+        self.futures.append(executor.submit(
+            sample_layouts, self.grid_size, tuple(self.lengths),
+            self.blocked, self.hits, self.samples_per_task,
+            self.rng.getrandbits(64)))
+
+    def start(self):
+        """Starts sampling for the next move if it hasn't started already,
+        giving every worker two batches to work on.
+        """
+
+        if self.deadline == None:
+            self.deadline = time.perf_counter() + self.time_limit
+            self.counts = {}
+            self.made = 0
+            for _ in range(self.batches):
+                self.submit()
+
+    def collect(self):
+        """Adds up the results of any finished batches and replaces them with
+        new ones while there is time left.
+        """
+
+        still_running = []
+        for future in self.futures:
+            if future.done():
+                if not future.cancelled() and future.exception() == None:
+                    counts, made = future.result()
+                    self.made += made
+                    for i, count in counts.items():
+                        self.counts[i] = self.counts.get(i, 0) + count
+            else:
+                still_running.append(future)
+        self.futures = still_running
+
+        while not self.done() and len(self.futures) < self.batches:
+            self.submit()
+
+    def done(self):
+        """Returns True once the time is up or there are enough layouts."""
+
+        if self.max_samples != None and self.made >= self.max_samples:
+            return True
+        return time.perf_counter() >= self.deadline
+
+    def finish(self, board):
+        """Stops sampling and returns the column and row of the unguessed
+        cell covered by the most layouts.
+        """
+
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+        self.deadline = None
+
+        # the fallback only has a random order of the cells on small grids.
+        # otherwise the cells are looked at in the order they were sampled
+        order = self.fallback.order
+        if order == None:
+            order = self.counts
+
+        guessed = board.guessed
+        best = None
+        best_count = 0
+        for i in order:
+            if not guessed[i] and self.counts.get(i, 0) > best_count:
+                best = i
+                best_count = self.counts[i]
+
+        if best == None:
+            return self.fallback.choose(board)
+        return divmod(best, self.grid_size)
+
+    def poll(self, board):
+        """Starts sampling if needed and returns None straight away while
+        there is still time left, so the game loop never has to wait.
+        Returns the column and row to guess once the time is up.
+        """
+
+        self.start()
+        self.collect()
+        if not self.done():
+            return None
+        return self.finish(board)
+
+    def choose(self, board):
+        """Samples until the time limit and returns the column and row to
+        guess.
+        """
+
+        self.start()
+        while True:
+            self.collect()
+            if self.done():
+                break
+            concurrent.futures.wait(
+                self.futures, self.deadline - time.perf_counter(),
+                concurrent.futures.FIRST_COMPLETED)
+
+        return self.finish(board)
+
+
+class HeuristicTargeter:
+
+    def __init__(self, grid_size=10, fleet_lengths=None, rng=random):
+        """Sets up the original computer opponent, which guesses randomly
+        until it gets a hit and then works outwards from the hit until the
+        ship is sunk.
+        """
+
+        self.grid_size = grid_size
+        self.rng = rng
+        self.board = None
+
+        self.unresolved_hit = False
+        self.first_hit_column = 0
+        self.first_hit_row = 0
+        self.last_hit_column = 0
+        self.last_hit_row = 0
+        self.forget_ship()
+
+    def forget_ship(self):
+        """Resets everything the strategy knows about the ship it is after."""
+
+        self.unresolved_hit = False
+        self.knows_horizontal = False
+        self.knows_vertical = False
+        self.not_up = False
+        self.not_right = False
+        self.not_down = False
+        self.not_left = False
+
+    def unavailable(self, column, row):
+        """Returns True if a cell is off the board or already guessed."""
+
+        return (not self.board.in_bounds(column, row)
+                or self.board.guessed[column * self.grid_size + row])
+
+    def choose(self, board):
+        """Returns the column and row of the cell to guess next."""
+
+        self.board = board
+        rng = self.rng
+
+        column = 0
+        row = 0
+        has_potential_guess = False
+        tries = 0
+
+        # loop until there is a valid tile available to guess
+        while not has_potential_guess or self.unavailable(column, row):
+            # give up on a ship that can't be followed any further rather
+            # than looping forever
+            tries += 1
+            if tries > 100:
+                self.forget_ship()
+
+            column_change = 0
+            row_change = 0
+
+            # choose random point if there is no unresolved hit
+            if not self.unresolved_hit:
+                column = rng.randrange(self.grid_size)
+                row = rng.randrange(self.grid_size)
+
+            else:
+                column = self.last_hit_column
+                row = self.last_hit_row
+
+                if self.knows_horizontal:
+                    if self.not_left and self.not_right:
+                        # choose the point at the other end of the ship if
+                        # there was a miss off one end
+                        column = self.first_hit_column
+                        if self.last_hit_column > self.first_hit_column:
+                            column_change = -1
+                            self.not_left = False
+                        else:
+                            column_change = 1
+                            self.not_right = False
+                    elif self.not_left:
+                        column_change = 1
+                        self.not_right = False
+                    elif self.not_right:
+                        column_change = -1
+                        self.not_left = False
+                    else:
+                        column_change = rng.choice((-1, 1))
+
+                elif self.knows_vertical:
+                    if self.not_up and self.not_down:
+                        row = self.first_hit_row
+                        if self.last_hit_row > self.first_hit_row:
+                            row_change = -1
+                            self.not_up = False
+                        else:
+                            row_change = 1
+                            self.not_down = False
+                    elif self.not_up:
+                        row_change = 1
+                        self.not_down = False
+                    elif self.not_down:
+                        row_change = -1
+                        self.not_up = False
+                    else:
+                        row_change = rng.choice((-1, 1))
+                else:
+                    # choose random point around last hit if nothing else is
+                    # known
+                    if rng.choice((True, False)):
+                        column_change = rng.choice((-1, 1))
+                    else:
+                        row_change = rng.choice((-1, 1))
+
+            column += column_change
+            row += row_change
+            has_potential_guess = True
+
+        return column, row
+
+    def observe(self, column, row, ship):
+        """Updates what the strategy knows after a guess. ship is the ship
+        that was hit, or None for a miss.
+        """
+
+        if ship != None:
+            if not self.unresolved_hit:
+                self.first_hit_column = column
+                self.first_hit_row = row
+
+            self.last_hit_column = column
+            self.last_hit_row = row
+            self.unresolved_hit = True
+
+        if self.unresolved_hit:
+            # check for invalid future guesses around last hit
+            last_column = self.last_hit_column
+            last_row = self.last_hit_row
+            if self.unavailable(last_column, last_row - 1):
+                self.not_up = True
+            if self.unavailable(last_column, last_row + 1):
+                self.not_down = True
+            if self.unavailable(last_column - 1, last_row):
+                self.not_left = True
+            if self.unavailable(last_column + 1, last_row):
+                self.not_right = True
+
+            # check if ship is definitely horizontal/vertical based on two
+            # adjacent hits, or on an invalid guess either side of one hit
+            if (not self.knows_vertical
+                    and last_column != self.first_hit_column):
+                self.knows_horizontal = True
+            elif (not self.knows_horizontal
+                    and last_row != self.first_hit_row):
+                self.knows_vertical = True
+            elif (not self.knows_vertical and self.not_up
+                    and self.not_down):
+                self.knows_horizontal = True
+            elif (not self.knows_horizontal and self.not_left
+                    and self.not_right):
+                self.knows_vertical = True
+
+        # reset everything once the ship is sunk
+        if ship != None and ship.sunk:
+            self.forget_ship()
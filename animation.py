@@ -0,0 +1,140 @@
+import math
+import time
+
+# how many times a second every animation moves, however often frames are
+# drawn
+STEPS_PER_SECOND = 120
+
+# the most time that is caught up on in one frame, so a long pause doesn't
+# make the next frame take even longer
+MAX_CATCH_UP = 0.25
+
+
+class Glide:
+
+    __slots__ = ('ship', 'x', 'y', 'previous_x', 'previous_y', 'target_x',
+                 'target_y', 'x_velocity', 'y_velocity', 'step_distance')
+
+    def __init__(self, ship, x, y, speed, step):
+        """Sets up a ship moving in a straight line from where it is to a
+        point at a number of pixels a second, one step of step seconds at a
+        time.
+        """
+
+        self.ship = ship
+        self.x = self.previous_x = ship.rect.x
+        self.y = self.previous_y = ship.rect.y
+        self.target_x = x
+        self.target_y = y
+
+        distance = math.hypot(x - self.x, y - self.y)
+        self.step_distance = speed * step
+        if distance == 0:
+            self.x_velocity = 0
+            self.y_velocity = 0
+        else:
+            self.x_velocity = (x - self.x) / distance * self.step_distance
+            self.y_velocity = (y - self.y) / distance * self.step_distance
+
+    def advance(self):
+        """Moves one step closer to the target. Returns True once the target
+        is reached.
+        """
+
+        self.previous_x = self.x
+        self.previous_y = self.y
+
+        if (math.hypot(self.target_x - self.x, self.target_y - self.y)
+                <= self.step_distance):
+            self.x = self.target_x
+            self.y = self.target_y
+            return True
+
+        self.x += self.x_velocity
+        self.y += self.y_velocity
+        return False
+
+    def show(self, fraction):
+        """Puts the ship a fraction of the way from where it was before the
+        last step to where it is now.
+        """
+
+        rect = self.ship.rect
+        rect.x = int(self.previous_x + (self.x - self.previous_x) * fraction)
+        rect.y = int(self.previous_y + (self.y - self.previous_y) * fraction)
+
+
+class Animator:
+
+    def __init__(self, clock=time.monotonic,
+                 steps_per_second=STEPS_PER_SECOND):
+        """Sets up the ships that are gliding somewhere. They all move in
+        fixed steps of time, so they move the same whatever the frame rate,
+        and are drawn between their last two steps so the movement looks
+        smooth. clock is called to get the current time in seconds.
+        """
+
+        self.clock = clock
+        self.step = 1 / steps_per_second
+
+        # the glide of each ship that is moving. ships that aren't moving
+        # aren't in here, so they cost nothing
+        self.glides = {}
+
+        # when the animations were last moved on, and how much time has
+        # passed since then that is too short for a whole step
+        self.last_time = None
+        self.left_over = 0.0
+
+    def glide(self, ship, x, y, speed):
+        """Starts a ship gliding from where it is to a point on the screen at
+        a number of pixels a second, replacing any glide it was already
+        doing.
+        """
+
+        if not self.glides:
+            self.last_time = self.clock()
+            self.left_over = 0.0
+
+        self.glides[ship] = Glide(ship, x, y, speed, self.step)
+
+    def stop(self, ship):
+        """Stops a ship gliding, leaving it where it is. Does nothing if it
+        isn't gliding.
+        """
+
+        self.glides.pop(ship, None)
+
+    def is_gliding(self, ship):
+        """Returns True if a ship is gliding somewhere."""
+
+        return ship in self.glides
+
+    def run(self):
+        """Moves every gliding ship on by however many steps fit in the time
+        since the last call and puts each ship where it should be drawn.
+        Returns how many steps were taken.
+        """
+
+        if not self.glides:
+            return 0
+
+        now = self.clock()
+        self.left_over += min(now - self.last_time, MAX_CATCH_UP)
+        self.last_time = now
+
+        steps = 0
+        glides = self.glides
+        while self.left_over >= self.step and glides:
+            self.left_over -= self.step
+            steps += 1
+            for ship, glide in list(glides.items()):
+                if glide.advance():
+                    glide.show(1)
+                    del glides[ship]
+
+        fraction = self.left_over / self.step
+        for glide in glides.values():
+            glide.show(fraction)
+
+        return steps
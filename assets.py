@@ -0,0 +1,149 @@
+import functools
+import os
+import pygame
+
+# the folder the ship artwork is kept in, next to this file
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'ship_images')
+
+# the full size image of each ship, loaded the first time it is needed and
+# shared by every Ship in the process
+images = {}
+
+
+def ship_image(name):
+    """Returns the full size image of a ship, loading it from ship_images the
+    first time it is asked for.
+    Once a display has been set up the image is converted to the display's
+    pixel format, which makes scaling and drawing it much faster.
+    The same Surface is returned every time, so it must not be drawn on.
+    """
+
+    image, converted = images.get(name, (None, False))
+
+    if image == None:
+        image = pygame.image.load(os.path.join(IMAGE_DIR, name + '.png'))
+
+    if not converted and pygame.display.get_surface() != None:
+        image = image.convert_alpha()
+        converted = True
+
+    images[name] = (image, converted)
+    return image
+
+
+# scaled copies of the ship images keyed by (name, length, tile size,
+# horizontal), shared by every Ship drawn at that size. only the most recent
+# tile size is kept, so changing it throws away the old copies
+scaled = {}
+scaled_tile_size = None
+
+# a hit marker for each (tile size, color)
+markers = {}
+
+
+def scaled_ship_image(name, length, tile_size, horizontal):
+    """Returns the image of a ship scaled to cover length tiles, rotated to
+    stand upright if it isn't horizontal.
+    The same Surface is returned every time, so it must not be drawn on.
+    """
+
+    global scaled_tile_size
+    if tile_size != scaled_tile_size:
+        scaled.clear()
+        markers.clear()
+        scaled_tile_size = tile_size
+
+    key = (name, length, tile_size, horizontal)
+    image = scaled.get(key)
+
+    if image == None:
+        if horizontal:
+            image = pygame.transform.scale(ship_image(name),
+                                           (tile_size * length, tile_size))
+        else:
+            image = pygame.transform.rotate(
+                scaled_ship_image(name, length, tile_size, True), -90)
+        scaled[key] = image
+
+    return image
+
+
+def hit_marker(tile_size, color):
+    """Returns a see-through tile sized Surface with a circle in the middle,
+    drawn over a ship where it has been hit.
+    """
+
+    key = (tile_size, tuple(color))
+    marker = markers.get(key)
+
+    if marker == None:
+        marker = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
+        pygame.draw.circle(marker, color, (tile_size // 2, tile_size // 2),
+                           tile_size // 4)
+        markers[key] = marker
+
+    return marker
+
+
+# every font that has been loaded, keyed by (face, size)
+fonts = {}
+
+
+def font(size, face='arial'):
+    """Returns a system font of a certain size, only looking it up the first
+    time it is asked for.
+    """
+
+    key = (face, size)
+    if key not in fonts:
+        fonts[key] = pygame.font.SysFont(face, size)
+    return fonts[key]
+
+
+def render_text(text, size, color='black', face='arial'):
+    """Returns a Surface with a line of text on it. Text that was rendered
+    recently comes from a cache, so it must not be drawn on.
+    """
+
+    if isinstance(color, pygame.Color):
+        color = tuple(color)
+    return cached_render(text, size, color, face)
+
+
+@functools.lru_cache(maxsize=256)
+def cached_render(text, size, color, face):
+    """Renders a line of text. color must be hashable."""
+
+    return font(size, face).render(text, True, color)
+
+
+@functools.lru_cache(maxsize=64)
+def wrap_text(sentence, size, width, face='arial'):
+    """Breaks a sentence into a tuple of lines that each fit inside a width.
+    Each word is measured once and the lines are built up from the word
+    widths.
+    """
+
+    f = font(size, face)
+    space = f.size(' ')[0]
+
+    lines = []
+    line = []
+    line_width = 0
+    for word in sentence.split():
+        word_width = f.size(word)[0]
+        if line and line_width + space + word_width >= width:
+            lines.append(' '.join(line))
+            line = []
+            line_width = 0
+
+        if line:
+            line_width += space
+        line_width += word_width
+        line.append(word)
+
+    if line:
+        lines.append(' '.join(line))
+
+    return tuple(lines)
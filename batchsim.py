@@ -0,0 +1,199 @@
+import numpy as np
+
+import fleet
+from engine import DEFAULT_FLEET
+
+
+class BatchSimulator:
+
+    def __init__(self, games, grid_size=10, fleet_spec=DEFAULT_FLEET,
+                 seed=None, layouts=None):
+        """Sets up a number of games that are played in lockstep. Each board
+        is a row in a stack of arrays with one column per cell, indexed by
+        column * grid_size + row like BoardModel.
+        fleet_spec is a list of (name, length) pairs, the same as the
+        add_ship calls in setup(). Random layouts are made from the seed
+        unless a list of layouts from fleet.random_layouts is given.
+        """
+
+        self.games = games
+        self.grid_size = grid_size
+        self.cells = grid_size * grid_size
+        self.fleet_spec = tuple(fleet_spec)
+
+        if layouts == None:
+            layouts = fleet.random_layouts(games, grid_size, self.fleet_spec,
+                                           seed)
+
+        # the id of the ship in each cell (its place in the fleet spec), or -1
+        # for water
+        self.ship_ids = np.full((games, self.cells), -1, dtype=np.int16)
+        for g, layout in enumerate(layouts):
+            for s, (column, row, horizontal) in enumerate(layout):
+                start = column * grid_size + row
+                step = grid_size if horizontal else 1
+                length = self.fleet_spec[s][1]
+                self.ship_ids[g, start:start + step * length:step] = s
+
+        lengths = np.array([length for _, length in self.fleet_spec],
+                           dtype=np.int16)
+
+        self.guessed = np.zeros((games, self.cells), dtype=bool)
+        self.hit = np.zeros((games, self.cells), dtype=bool)
+        self.sunk_cells = np.zeros((games, self.cells), dtype=bool)
+
+        # how many cells of each ship haven't been hit, and how many ships
+        # are still afloat, on each board
+        self.remaining = np.tile(lengths, (games, 1))
+        self.ships_left = np.full(games, len(self.fleet_spec), dtype=np.int16)
+
+        self.shots = np.zeros(games, dtype=np.int32)
+        self.done = np.zeros(games, dtype=bool)
+
+    def spread(self, masks):
+        """Returns a copy of a stack of cell masks with every cell around a
+        set cell also set.
+        """
+
+        gs = self.grid_size
+        grids = masks.reshape(-1, gs, gs)
+        padded = np.zeros((grids.shape[0], gs + 2, gs + 2), dtype=bool)
+        padded[:, 1:-1, 1:-1] = grids
+
+        spread = np.zeros_like(grids)
+        for dc in range(3):
+            for dr in range(3):
+                spread |= padded[:, dc:dc + gs, dr:dr + gs]
+
+        return spread.reshape(masks.shape)
+
+    def step(self, cells):
+        """Guesses one cell on every board that is still being played. cells
+        is an array with a flat cell index for every board (entries for
+        finished boards are ignored). Sinking a ship marks every cell around
+        it as guessed, like BoardModel.guess.
+        Returns an array that is True for each board where the guess was a
+        hit. Raises ValueError if a cell was already guessed.
+        """
+
+        boards = np.flatnonzero(~self.done)
+        cells = np.asarray(cells)[boards]
+
+        if self.guessed[boards, cells].any():
+            raise ValueError('a cell was guessed twice')
+
+        self.guessed[boards, cells] = True
+        self.shots[boards] += 1
+
+        ids = self.ship_ids[boards, cells]
+        is_hit = ids >= 0
+        hit_boards = boards[is_hit]
+        hit_ids = ids[is_hit]
+        self.hit[hit_boards, cells[is_hit]] = True
+
+        self.remaining[hit_boards, hit_ids] -= 1
+        is_sunk = self.remaining[hit_boards, hit_ids] == 0
+
+        if is_sunk.any():
+            # each board gets one guess per step, so sunk_boards has no
+            # repeats and can be used for fancy-indexed assignment
+            sunk_boards = hit_boards[is_sunk]
+            ships = self.ship_ids[sunk_boards] == hit_ids[is_sunk][:, None]
+
+            self.sunk_cells[sunk_boards] |= ships
+            self.guessed[sunk_boards] |= self.spread(ships)
+
+            self.ships_left[sunk_boards] -= 1
+            self.done[sunk_boards] = self.ships_left[sunk_boards] == 0
+
+        hits = np.zeros(self.games, dtype=bool)
+        hits[hit_boards] = True
+        return hits
+
+    def run(self, policy):
+        """Plays every game to the end. policy is called with the simulator
+        before each step and returns the cells to guess.
+        Returns an array of how many shots each game took.
+        """
+
+        while not self.done.all():
+            self.step(policy(self))
+
+        return self.shots
+
+
+def random_priorities(sim, rng):
+    """Returns a random score between 0 and 1 for every cell of every board.
+    Guessing the unguessed cell with the highest score each step is the same
+    as guessing randomly, and is much cheaper than drawing new random numbers
+    every step.
+    """
+
+    return rng.random((sim.games, sim.cells), dtype=np.float32)
+
+
+def random_policy(rng):
+    """Returns a policy that guesses a random cell that hasn't been guessed on
+    each board.
+    """
+
+    priorities = None
+
+    def policy(sim):
+        nonlocal priorities
+        if priorities is None:
+            priorities = random_priorities(sim, rng)
+
+        # guessed cells get a score below 0 so they are never the highest
+        boards = np.flatnonzero(~sim.done)
+        scores = priorities[boards]
+        scores -= sim.guessed[boards]
+
+        cells = np.zeros(sim.games, dtype=np.intp)
+        cells[boards] = scores.argmax(axis=1)
+        return cells
+
+    return policy
+
+
+def hunt_target_policy(rng):
+    """Returns a policy that guesses next to hits on ships that haven't been
+    sunk yet, and guesses randomly on a checkerboard pattern otherwise.
+    """
+
+    priorities = None
+
+    def policy(sim):
+        nonlocal priorities
+        gs = sim.grid_size
+
+        if priorities is None:
+            # every ship covers a cell of each colour of a checkerboard, so
+            # hunting only needs one colour
+            column, row = np.indices((gs, gs))
+            parity = ((column + row) % 2 == 0).reshape(-1)
+            priorities = random_priorities(sim, rng) + parity
+
+        boards = np.flatnonzero(~sim.done)
+        open_hits = (sim.hit[boards]
+                     & ~sim.sunk_cells[boards]).reshape(-1, gs, gs)
+
+        # count the unsunk hits directly above, below, left and right of
+        # each cell
+        targets = np.zeros(open_hits.shape, dtype=np.float32)
+        targets[:, 1:, :] += open_hits[:, :-1, :]
+        targets[:, :-1, :] += open_hits[:, 1:, :]
+        targets[:, :, 1:] += open_hits[:, :, :-1]
+        targets[:, :, :-1] += open_hits[:, :, 1:]
+
+        scores = priorities[boards]
+        scores += targets.reshape(len(boards), -1) * 4
+
+        # guessed cells get a score below 0 so they are never the highest
+        scores -= sim.guessed[boards] * np.float32(16)
+
+        cells = np.zeros(sim.games, dtype=np.intp)
+        cells[boards] = scores.argmax(axis=1)
+        return cells
+
+    return policy
@@ -1,19 +1,31 @@
 print("Loading...")
 
+import argparse
 import math
+import os
 import pygame
 import random
-import time
 
+import assets
+import fleet
+import savegame
+from animation import Animator
 from board import Board
+from client import RemoteBoardModel, RemoteOpponent
+from game import ComputerPlayer, Game
+from profiler import FrameProfiler
+from replay import ReplayWriter
+from scheduler import Scheduler
 from tile import Tile
 from ship import Ship
 from button import Button
 
-pygame.init()
-
-screen = pygame.display.set_mode((0, 0))
-clock = pygame.time.Clock()
+# how far each arrow key scrolls a board bigger than its view, in columns and
+# rows
+SCROLL_KEYS = {pygame.K_LEFT: (-1, 0),
+               pygame.K_RIGHT: (1, 0),
+               pygame.K_UP: (0, -1),
+               pygame.K_DOWN: (0, 1)}
 
 def setup():
     """Initializes the player's board and the opponent's board and sizes them
@@ -23,7 +35,7 @@ def setup():
     """
     
     global player_board, opponent_board, player_board_x, opponent_board_x, \
-           window_width, padding, game_state, turn_length
+           window_width, padding, screen, animator
     
     # set up the window and the boards
     window_width = 1000
@@ -31,15 +43,36 @@ def setup():
     player_board_x = padding
     opponent_board_x = (window_width // 2) + (padding // 2)
     board_width = (window_width - padding * 3) // 2
-    
     turn_length = 1
     
-    player_board = Board(board_width, 10, turn_length, 'Your Board', True)
+    # big grids only store the cells with ships in them, and only part of
+    # each board is shown at a time
+    sparse = grid_size > fleet.BITBOARD_LIMIT
+    
+    player_board = Board(board_width, grid_size, turn_length, 'Your Board',
+                         True, not sparse, sparse, view_size)
     player_board.set_pos(player_board_x, padding)
     
-    opponent_board = Board(board_width, 10, turn_length, "Opponent's Board")
+    # the opponent's ships are only known once they are sunk when playing
+    # on a server
+    opponent_model = None
+    if remote != None:
+        opponent_model = RemoteBoardModel(grid_size)
+    
+    opponent_board = Board(board_width, grid_size, turn_length,
+                           "Opponent's Board", False, not sparse, sparse,
+                           view_size, opponent_model)
     opponent_board.set_pos(opponent_board_x, padding)
     
+    # record every placement and guess if there is a replay log
+    player_board.replay = replay
+    opponent_board.replay = replay
+    
+    # every ship glides in fixed steps of time, whatever the frame rate
+    animator = Animator()
+    player_board.animator = animator
+    opponent_board.animator = animator
+    
     window_height = (player_board.height + (player_board.tile_size * 2)
                      + (padding * 2))
     screen = pygame.display.set_mode((window_width, window_height))
@@ -50,32 +83,34 @@ def setup():
     under_boards_y = (padding + player_board.height
                       + (player_board.tile_size // 2))
     
-    # initialize ships
-    opponent_board.add_ship('carrier', 5, 0, 0, False)
-    opponent_board.add_ship('battleship', 4, 0, 0, False)
-    opponent_board.add_ship('submarine', 3, 0, 0, False)
-    opponent_board.add_ship('cruiser', 3, 0, 0, False)
-    opponent_board.add_ship('destroyer', 2, 0, 0, False)
-    
+    # initialize ships. only the player's first ship is shown to start with
     ship_x = player_board_x + player_board.tile_size
-    player_board.add_ship('carrier', 5, ship_x, under_boards_y)
-    player_board.add_ship('battleship', 4, ship_x, under_boards_y, False)
-    player_board.add_ship('submarine', 3, ship_x, under_boards_y, False)
-    player_board.add_ship('cruiser', 3, ship_x, under_boards_y, False)
-    player_board.add_ship('destroyer', 2, ship_x, under_boards_y, False)
+    for n, (name, length) in enumerate(fleet_spec):
+        opponent_board.add_ship(name, length, 0, 0, False)
+        player_board.add_ship(name, length, ship_x, under_boards_y, n == 0)
     
     # set up text area under the boards and buttons
-    global text_surface, text_x
+    global text_surface, text_x, text_rect
     text_surface = pygame.Surface((player_board.width,
                                    window_height - under_boards_y))
     text_surface.fill('white')
     text_x = visual_center_x - (player_board.width // 2)
+    text_rect = text_surface.get_rect().move(text_x, under_boards_y)
+    
+    # the whole window needs drawing to start with. after that only the parts
+    # that change are drawn
+    global redraw_all
+    redraw_all = True
     
     global instructions
     instructions = ('Drag your ships onto your board. Right click on a ship to'
                     + ' rotate it 90 degrees. Ships must be fully on the board'
                     + ' and may not overlap each other or be touching each'
                     + ' other.')
+    if player_board.scrolls:
+        instructions = ('Your ships have been placed for you. Drag them to'
+                        + ' move them, or press ready. Scroll a board with'
+                        + ' the mouse wheel or the arrow keys.')
     
     global ready_button, play_again_button
     button_width = window_width // 5
@@ -87,417 +122,558 @@ def setup():
                                button_width, button_width // 4, reset,
                                Tile.BLUE, 'Play again', False)
     
-    # initialize variables to control the flow of the player's turns and the
-    # computer's guessing logic
-    global first_turn, tile_clicked
-    
-    global computer_unresolved_hit, computer_first_hit_column, \
-           computer_first_hit_row, computer_last_hit_column, \
-           computer_last_hit_row, computer_knows_horizontal, \
-           computer_knows_vertical, not_up, not_right, not_down, not_left
+    # the flow of the player's turns and the computer's guessing logic are
+    # kept in the game. turns end after a delay so the player can see what
+    # happened, without stopping the game loop
+    global game, scheduler
+    game = Game([player_board, opponent_board])
+    scheduler = Scheduler()
     
     reset()
     
 def reset():
     """Resets the boards."""
     
-    global game_state, turn_length, first_turn, tile_clicked, not_up, \
-           not_right, not_down, not_left, computer_knows_horizontal, \
-           computer_knows_vertical, computer_unresolved_hit
+    if replay != None:
+        replay.start_game(grid_size, fleet_spec)
+    
+    # hide the buttons until they are needed
+    ready_button.set_visible(False)
+    play_again_button.set_visible(False)
     
     # reset the player's ships
-    for ship in player_board.ships:
-        player_board.erase_ship(ship)
-        ship.reset()
+    player_board.reset()
+    for n, ship in enumerate(player_board.ships):
         ship.set_position(player_board_x + player_board.tile_size,
                           under_boards_y)
         
-        if ship.name == 'carrier':
+        if n == 0:
             ship.lock(False)
         else:
             ship.lock(True)
             ship.set_visible(False)
     
-    player_board.reset()
-    player_board.update()
+    # there are too many ships to place by hand on a board that scrolls
+    if player_board.scrolls:
+        randomize_board(player_board)
+        for ship in player_board.ships:
+            ship.set_visible(True)
+            ship.lock(False)
     
     # reset opponent's ships
+    opponent_board.reset()
     for ship in opponent_board.ships:
-        opponent_board.erase_ship(ship)
-        ship.reset()
         ship.set_visible(False)
     
-    opponent_board.reset()
-    randomize_opponent_board()
+    # the server places the opponent's ships
+    if remote == None:
+        randomize_board(opponent_board)
     
     # display setup instructions
     set_text(instructions)
     
     # reset logic for player's turn and computer guessing
-    tile_clicked = False
-    first_turn = True
-    not_up = False
-    not_right = False
-    not_down = False
-    not_left = False
-    computer_knows_horizontal = False
-    computer_knows_vertical = False
-    computer_unresolved_hit = False
-    
-    game_state = 'setup'
-    turn_length = 1
+    scheduler.clear()
+    game.reset()
+    if remote != None:
+        game.computer = remote
+        remote.join(grid_size, fleet_copies)
+    elif (strong_opponent
+            and player_board.grid_size <= fleet.BITBOARD_LIMIT):
+        new_computer('montecarlo', random.getrandbits(32))
+    else:
+        new_computer('density', random.getrandbits(32))
+    
+def new_computer(kind, seed):
+    """Makes a new computer opponent of a kind from savegame.COMPUTERS, which
+    makes its random choices from a seed.
+    """
     
-def randomize_opponent_board():
-    """Sets up the opponent's board randomly."""
+    fleet_lengths = [ship.length for ship in player_board.ships]
+    game.computer = ComputerPlayer(kind, seed, player_board.grid_size,
+                                   fleet_lengths)
     
-    for ship in opponent_board.ships:
-        ship.reset()
-        
-        horizontal = True
-        tile = opponent_board.tiles[0][0]
-        
-        while (ship.main_tile == None
-               or not opponent_board.ship_at_valid_position(tile, ship,
-                                                            horizontal)):
-            horizontal = random.choice((True, False))
-            row = random.randint(0, 9)
-            column = random.randint(0, 9)
-            tile = opponent_board.tiles[column][row]
-            ship.place_directly_at(tile, horizontal)
-            opponent_board.update()
+def randomize_board(board):
+    """Puts the ships on a board at random positions."""
+    
+    fleet_spec = [(ship.name, ship.length) for ship in board.ships]
+    layout = fleet.random_layouts(1, board.grid_size, fleet_spec,
+                                  random.random())[0]
+    
+    for ship, (column, row, horizontal) in zip(board.ships, layout):
+        board.place_ship(ship, board.get_tile(column, row), horizontal, False)
             
 def set_text(sentence):
     """Sets the text to be displayed under the board."""
               
-    global text_surface
+    global text_surface, text_changed, current_text
+    text_changed = True
+    current_text = sentence
               
     text_width = text_surface.get_rect().width
     text_surface.fill('white')
               
-    if sentence != '':
-        font = pygame.font.SysFont('arial', player_board.tile_size // 2)
-        words = sentence.split()
-        lines = []
-        
-        # break the sentence into lines that will fit on the text surface
-        done = False
-        n = 0
-        while not done:
-            line = ''
-            test_string = words[n]
-            while font.size(test_string)[0] < text_width:
-                line += ' ' + words[n]
-                test_string += ' ' + words[n+1]
-                n += 1
-                if n+1 == len(words):
-                    line += ' ' + words[n]
-                    done = True
-                    break
-                
-            lines.append(line)
-        
-        # display each line on the text surface
-        for y, line in enumerate(lines):
-            text = font.render(line, True, 'black')
-            text_rect = text.get_rect()
-            text_rect.center = text_surface.get_rect().center
-            text_rect.y = int(y * player_board.tile_size * 0.8)
-            text_surface.blit(text, text_rect)
+    # break the sentence into lines that will fit on the text surface, then
+    # display each line on the text surface
+    size = player_board.tile_size // 2
+    for y, line in enumerate(assets.wrap_text(sentence, size, text_width)):
+        text = assets.render_text(line, size)
+        line_rect = text.get_rect()
+        line_rect.center = text_surface.get_rect().center
+        line_rect.y = int(y * player_board.tile_size * 0.8)
+        text_surface.blit(text, line_rect)
         
 def start():
-    """Changes the game state to 'player turn'."""
+    """Changes the game state to 'player turn'. When playing on a server the
+    player's ships are sent to it first, and the game waits for it to say
+    who goes first.
+    """
+    
+    ready_button.set_visible(False)
+    
+    if remote != None:
+        remote.send_layout(player_board.ships)
+        game.state = 'waiting for opponent'
+        set_text('Waiting for your opponent')
+        return
     
-    global game_state
-    game_state = 'player turn'
+    game.state = 'player turn'
     set_text(("Your turn: Click the tile you want to guess on your opponent's"
               + " board. Red means hit, grey means miss. Have fun!"))
     
-def computer_guess():
-    """Simulates a guess from the opponent."""
+def player_guess(column, row):
+    """Guesses a tile on the opponent's board for the player and ends the
+    player's turn.
+    """
     
-    global turn_length
-    global computer_unresolved_hit, computer_first_hit_column, \
-           computer_first_hit_row, computer_last_hit_column, \
-           computer_last_hit_row, not_up, not_right, not_down, not_left, \
-           computer_knows_horizontal, computer_knows_vertical
+    opponent_board.guess(column, row)
     
-    column = 0
-    row = 0
-    column_change = 0
-    row_change = 0
+    # make the ship visible once it is sunk
+    ship = opponent_board.model.ship_at(column, row)
+    if ship != None and ship.sunk:
+        ship.set_visible(True)
+        game.turn_length = 2
+        
+    game.tile_clicked = True
     
-    has_potential_guess = False
+def remote_result(message):
+    """Makes the player's guess on the opponent's board once the server has
+    said what it hit. A ship that was sunk is put on the board first, with
+    its earlier hits.
+    """
     
-    # loop until there is a valid tile available to guess
-    while (not has_potential_guess or player_board.get_tile(column, row) == None
-               or player_board.tiles[column][row].guessed):
-                
-        # choose random point if there is no unresolved hit
-        if not computer_unresolved_hit:
-            column = random.randint(0, 9)
-            row = random.randint(0, 9)
-            
-        else:
-            column = computer_last_hit_column
-            row = computer_last_hit_row
-            column_change = 0
-            row_change = 0
-
-            if computer_knows_horizontal:
-                if not_left and not_right:
-                    # choose the point at the other end of the ship if there
-                    # was a miss off one end
-                    column = computer_first_hit_column
-                    if computer_last_hit_column > computer_first_hit_column:
-                        column_change = -1
-                        not_left = False
-                    else:
-                        column_change = 1
-                        not_right = False
-                        
-                elif not_left:
-                    # choose point to the right if it is definitely horizontal
-                    # but not left
-                    column_change = 1
-                    not_right = False
-                elif not_right:
-                    # choose point to the left if it is definitely horizontal
-                    # but not right
-                    column_change = -1
-                    not_left = False
-                else:
-                    # choose random point horizontal to last hit if it is
-                    # definitely horizontal but could be either end
-                    column_change = random.choice((-1, 1))
-
-            elif computer_knows_vertical:
-                if not_up and not_down:
-                    # choose the point at the other end of the ship if there
-                    # was a miss off one end
-                    row = computer_first_hit_row
-                    if computer_last_hit_row > computer_first_hit_row:
-                        row_change = -1
-                        not_up = False
-                    else:
-                        row_change = 1
-                        not_down = False
-                        
-                elif not_up:
-                    # choose point below if it is definitely vertical but
-                    # not up
-                    row_change = 1
-                    not_down = False
-                elif not_down:
-                    # choose point above if it is definitely vertical but
-                    # not down
-                    row_change = -1
-                    not_up = False
-                else:
-                    # choose random point vertical to last hit if it is
-                    # definitely vertical but could be either end
-                    row_change = random.choice((-1, 1))
+    game.awaiting_result = False
+    
+    def place(ship, column, row, horizontal):
+        opponent_board.place_ship(ship, opponent_board.get_tile(column, row),
+                                  horizontal, False)
+    
+    column = message['column']
+    row = message['row']
+    earlier = opponent_board.model.prepare(column, row, message['hit'],
+                                           message['sunk'], place)
+    if message['sunk'] != None:
+        ship = opponent_board.ships[message['sunk'][0]]
+        for i in earlier:
+            ship.hit(opponent_board.get_tile(*divmod(i, grid_size)))
+    
+    player_guess(column, row)
+    
+def handle_server_messages():
+    """Acts on the messages the server has sent since the last frame. The
+    opponent's guesses are left for computer_guess.
+    """
+    
+    for message in remote.receive():
+        kind = message['type']
+        if kind == 'start' and game.state == 'waiting for opponent':
+            if message['your_turn']:
+                game.state = 'player turn'
+                set_text("Your turn: Click the tile you want to guess on"
+                         + " your opponent's board.")
             else:
-                # choose random point around last hit if nothing else is known
-                if random.choice((True, False)):
-                    column_change = random.choice((-1, 1))
-                else:
-                    row_change = random.choice((-1, 1))
-                    
-        column += column_change
-        row += row_change
-                    
-        has_potential_guess = True
+                game.state = 'computer turn'
+                set_text("Opponent's turn")
+        elif kind == 'result' and game.awaiting_result:
+            remote_result(message)
+        elif kind == 'left' and game.state != 'game over':
+            scheduler.clear()
+            game.state = 'game over'
+            set_text('Your opponent left')
+        elif (kind == 'over' and game.winner() == None
+              and not remote.incoming):
+            # the boards show who won once the last guess has been made on
+            # them, so this is only for a match the server ended another way
+            scheduler.clear()
+            game.state = 'game over'
+            if message['won']:
+                set_text('You won!')
+            else:
+                set_text('Your opponent won')
+        elif kind == 'error':
+            set_text(message['message'])
+    
+def computer_guess():
+    """Simulates a guess from the opponent. Returns False without guessing if
+    the opponent hasn't decided on a guess yet, and True once it has guessed.
+    """
     
-    # make the guess
+    move = game.computer.poll(player_board.model)
+    if move == None:
+        return False
+    
+    column, row = move
     hit = player_board.guess(column, row)
     
-    # analize hit or miss
+    ship = None
     if hit:
-        if not computer_unresolved_hit:
-            computer_first_hit_column = column
-            computer_first_hit_row = row
-
-        computer_last_hit_column = column
-        computer_last_hit_row = row
-        
-        computer_unresolved_hit = True
-        
-    if computer_unresolved_hit:
-        # check for invalid future guesses around last hit
-        if (player_board.get_tile(computer_last_hit_column,
-                                  computer_last_hit_row - 1) == None
-            or player_board.get_tile(computer_last_hit_column,
-                                     computer_last_hit_row - 1).guessed):
-            not_up = True
-
-        if (player_board.get_tile(computer_last_hit_column,
-                                  computer_last_hit_row + 1) == None
-            or player_board.get_tile(computer_last_hit_column,
-                                     computer_last_hit_row + 1).guessed):
-            not_down = True
-            
-        if (player_board.get_tile(computer_last_hit_column - 1,
-                                  computer_last_hit_row) == None
-            or player_board.get_tile(computer_last_hit_column - 1,
-                                     computer_last_hit_row).guessed):
-            not_left = True
-            
-        if (player_board.get_tile(computer_last_hit_column + 1,
-                                  computer_last_hit_row) == None
-            or player_board.get_tile(computer_last_hit_column + 1,
-                                     computer_last_hit_row).guessed):
-            not_right = True
-            
-        # check if ship is definitly horizontal/vertical based on two adjacent
-        # hits
-        if (not computer_knows_vertical
-            and computer_last_hit_column != computer_first_hit_column):
-            computer_knows_horizontal = True
-            
-        elif (not computer_knows_horizontal
-              and computer_last_hit_row != computer_first_hit_row):
-            computer_knows_vertical = True
-        
-        # check if ship is definitely horizontal/vertical based on an invalid
-        # future guess on either side of a single hit
-        elif not computer_knows_vertical and not_up and not_down:
-            computer_knows_horizontal = True
-              
-        elif not computer_knows_horizontal and not_left and not_right:
-            computer_knows_vertical = True
-    
-    # reset all variables once the ship is sunk
-    if hit and player_board.tiles[column][row].ship.sunk:
-        not_up = False
-        not_right = False
-        not_down = False
-        not_left = False
-        computer_knows_horizontal = False
-        computer_knows_vertical = False
-        computer_unresolved_hit = False
+        ship = player_board.model.ship_at(column, row)
+    game.computer.observe(column, row, ship)
+    
+    # give the player longer to read the message once a ship is sunk
+    if hit and ship.sunk:
+        game.turn_length = 2
         
-        turn_length = 2
+    return True
     
 def check_win():
     """Returns True if either the player or the computer wins. Returns False
     otherwise.
     """
 
-    for n, ship in enumerate(opponent_board.ships):
-        if not ship.sunk:
-            break
-        elif n == 4:
-            set_text('You won!')
-            return True
-        
-    for n, ship in enumerate(player_board.ships):
-        if not ship.sunk:
-            break
-        elif n == 4:
-            set_text('Your opponent won')
-            return True
+    winner = game.winner()
+    if winner == 0:
+        set_text('You won!')
+    elif winner == 1:
+        set_text('Your opponent won')
     
-    return False
+    return winner != None
         
 def control_game_flow():
     """Changes the game state when appropriate."""
     
-    global game_state, turn_length, tile_clicked
-    
-    # display one ship at a time until it is placed on the board.
-    # display the ready button after all ships are placed
-    if game_state == 'setup' or game_state == 'ready':
-        for i, ship in enumerate(player_board.ships):
-            if ship.main_tile == None:
-                    ship.set_visible(True)
-                    ship.lock(False)
-                    break
-            elif i == 4:
-                game_state = 'ready'
-                set_text('')
-                ready_button.set_visible(True)
-    
-    # handle the player's turn
-    elif game_state == 'player turn':
-        if tile_clicked:
-            first_turn = False
-            render_graphics()
-            time.sleep(turn_length)
-            
-            if check_win():
-                game_state = 'game over'
-            else:
-                game_state = 'computer turn'
-                set_text("Opponent's turn")
-                tile_clicked = False 
-    
-    # handle the computer's turn
-    elif game_state == 'computer turn':
-        computer_guess()
-        render_graphics()
-        time.sleep(turn_length)
-        
-        if check_win():
-            game_state = 'game over'
+    if remote != None:
+        handle_server_messages()
+    
+    # display one ship at a time until it is placed on the board. ships are
+    # handed out in order, so the next one comes straight after the ones
+    # placed. display the ready button once all ships are placed
+    if game.state == 'setup':
+        if player_board.model.all_placed():
+            game.state = 'ready'
+            set_text('')
+            ready_button.set_visible(True)
         else:
-            game_state = 'player turn'
-            set_text('Your turn')
+            ship = player_board.ships[player_board.model.ships_placed]
+            ship.set_visible(True)
+            ship.lock(False)
+    
+    # handle the player's turn. the computer's turn starts after 1 turn
+    # length
+    elif game.state == 'player turn':
+        if game.tile_clicked:
+            game.first_turn = False
+            game.tile_clicked = False
+            wait('computer turn', "Opponent's turn")
+    
+    # handle the computer's turn. the player's turn starts after 1 turn length
+    elif game.state == 'computer turn':
+        # the computer may take a few frames to decide on its guess
+        if computer_guess():
+            wait('player turn', 'Your turn')
     
     # display the play again button once there is a winner
-    elif game_state == 'game over':
+    elif game.state == 'game over':
         play_again_button.set_visible(True)
         
-    turn_length = 1
+    game.turn_length = 1
+        
+def wait(next_state, message):
+    """Waits for 1 turn length so the player can see what happened, then
+    ends the turn.
+    """
+    
+    game.state = 'waiting'
+    game.pending_turn = (next_state, message)
+    scheduler.after(game.turn_length, end_turn, next_state, message)
+        
+def end_turn(next_state, message):
+    """Ends the game if someone won, and otherwise moves on to the next turn
+    and tells the player whose turn it is. Saves the game if it is being
+    saved.
+    """
+    
+    game.pending_turn = None
+    
+    if check_win():
+        game.state = 'game over'
+        if replay != None:
+            replay.end_game()
+    else:
+        game.state = next_state
+        set_text(message)
+    
+    if save_path != None:
+        savegame.save(save_path, save_game())
+        
+def save_game():
+    """Returns a SavedGame with the whole state of the game. A ship that is
+    being dragged is saved as if it was dropped back where it was.
+    """
+    
+    saved = savegame.SavedGame(grid_size, fleet_spec)
+    saved.state = game.state
+    saved.first_turn = game.first_turn
+    saved.tile_clicked = game.tile_clicked
+    saved.turn_length = game.turn_length
+    if game.state == 'waiting' and game.pending_turn != None:
+        saved.next_state, saved.message = game.pending_turn
+    saved.text = current_text
+    saved.computer = game.computer.kind
+    saved.computer_seed = game.computer.seed
+    
+    for board, saved_board in zip((player_board, opponent_board),
+                                  saved.boards):
+        saved_board.view_column = board.view_column
+        saved_board.view_row = board.view_row
+        for ship in board.ships:
+            position = None
+            if ship.is_placed():
+                position = (ship.column, ship.row)
+            elif ship.dragged and ship.main_tile != None:
+                # a dragged ship is off the board until it is dropped, and
+                # goes back to its main tile if it is dropped somewhere else
+                position = (ship.main_tile.column, ship.main_tile.row)
+            saved_board.ships.append((position, ship.horizontal, ship.show,
+                                      ship.locked))
+        saved_board.shots = list(board.shots)
+    
+    return saved
+    
+def load_game(saved):
+    """Puts the game back into the state of a SavedGame.
+    Raises ValueError if it was saved with a different grid size or fleet.
+    """
+    
+    global redraw_all
+    
+    if (saved.grid_size != grid_size
+            or saved.fleet_spec != tuple(fleet_spec)):
+        raise ValueError('the saved game has a different grid or fleet')
+    
+    scheduler.clear()
+    game.pending_turn = None
+    if replay != None:
+        replay.start_game(grid_size, fleet_spec)
+    
+    # the computer is shown its own guesses again as they are made. what it
+    # knew about the player's board is rebuilt from them before its next turn
+    new_computer(saved.computer, saved.computer_seed)
+    
+    for board, saved_board in zip((player_board, opponent_board),
+                                  saved.boards):
+        board.scroll(saved_board.view_column - board.view_column,
+                     saved_board.view_row - board.view_row)
+        positions = [None if position == None else position + (horizontal,)
+                     for position, horizontal, _, _ in saved_board.ships]
+        if board is player_board:
+            board.restore(positions, saved_board.shots,
+                          game.computer.observe)
+        else:
+            board.restore(positions, saved_board.shots)
+        
+        for ship, (position, horizontal, show, locked) in zip(
+                board.ships, saved_board.ships):
+            # ships that aren't on the board wait under it
+            if position == None:
+                if board is player_board:
+                    ship.set_position(player_board_x + board.tile_size,
+                                      under_boards_y)
+                if horizontal != ship.horizontal:
+                    ship.rotate()
+            ship.show = show
+            ship.locked = locked
+    
+    game.state = saved.state
+    game.first_turn = saved.first_turn
+    game.tile_clicked = saved.tile_clicked
+    game.turn_length = saved.turn_length
+    if game.state == 'waiting':
+        wait(saved.next_state, saved.message)
+    
+    ready_button.set_visible(game.state == 'ready')
+    play_again_button.set_visible(game.state == 'game over')
+    set_text(saved.text)
+    redraw_all = True
         
 def render_graphics():
-    """Displays everything on the screen."""
+    """Redraws the parts of the screen that changed since the last frame and
+    sends only those parts to the display. Does nothing if nothing changed.
+    """
+    
+    global redraw_all, text_changed
+    
+    ships = player_board.ships + opponent_board.ships
+    
+    # ask everything on the screen what changed, even if the whole screen is
+    # being redrawn, so they all know what they looked like last
+    rects = []
+    if text_changed:
+        rects.append(text_rect)
+        text_changed = False
+    rects += player_board.changed_rects()
+    rects += opponent_board.changed_rects()
+    for s in ships:
+        rects += s.changed_rects()
+    rects += ready_button.changed_rects()
+    rects += play_again_button.changed_rects()
+    rects += profiler.changed_rects()
+    
+    if redraw_all:
+        rects = [screen.get_rect()]
+        redraw_all = False
+    
+    if not rects:
+        return
+    
+    # redraw everything that overlaps the changed area, from the bottom up
+    area = rects[0].unionall(rects[1:])
+    screen.set_clip(area)
+    screen.fill('white')
     
     screen.blit(text_surface, (text_x, under_boards_y))
     
     player_board.draw(screen, player_board_x, padding)
     opponent_board.draw(screen, opponent_board_x, padding)
     
-    for s in player_board.ships:
-        s.draw(screen)
-    for s in opponent_board.ships:
-        s.draw(screen)
-        
-    if game_state == 'ready':
-        ready_button.draw(screen)
+    for board in (player_board, opponent_board):
+        for s in board.ships:
+            # ships on a board that scrolls only show inside the view, unless
+            # they are being dragged
+            if board.scrolls and s.main_tile != None and not s.dragged:
+                screen.set_clip(area.clip(board.grid_rect))
+                s.draw(screen)
+                screen.set_clip(area)
+            else:
+                s.draw(screen)
         
-    if game_state == 'game over':
-        play_again_button.draw(screen)
+    ready_button.draw(screen)
+    play_again_button.draw(screen)
+    
+    profiler.draw(screen)
     
-    pygame.display.flip()
+    screen.set_clip(None)
+    pygame.display.update(rects)
 
 
-def main():
+def board_under(coords):
+    """Returns the board whose grid is at a point on the screen, or None."""
+    
+    for board in (player_board, opponent_board):
+        if board.check_clicked(coords):
+            return board
+    return None
+
+
+def main(strong=False, grid=10, fleets=1, view=10, profile=None,
+         replay_path=None, save=None, server=None, versus='computer'):
     """Sets the window and its contents up then runs the main game loop.
     Handles events, game logic, and the display at 60 fps.
+    The opponent samples possible layouts on every CPU if strong=True.
+    Each board is grid tiles across with fleets copies of the standard fleet,
+    and shows view tiles across at a time.
+    Every frame's timings are written to the file named by profile when the
+    game is closed. F3 shows or hides the timings on screen.
+    Every game is added to the replay log named by replay_path.
+    The game is saved to the file named by save after every turn and when
+    it is closed, and carries on from there if the file already exists.
+    If server is a (host, port) address the opponent plays there instead,
+    either the server's computer or another player, as versus says. Games
+    on a server can't be saved.
     """
     
+    global strong_opponent, grid_size, fleet_spec, view_size, profiler, \
+           replay, save_path, remote, fleet_copies
+    strong_opponent = strong
+    grid_size = grid
+    fleet_copies = fleets
+    fleet_spec = fleet.repeat_fleet(fleets)
+    
+    remote = None
+    if server != None:
+        remote = RemoteOpponent(server, versus)
+        save = None
+    
+    # a saved game decides the grid size and fleet
+    save_path = save
+    saved = None
+    if save != None and os.path.exists(save):
+        saved = savegame.load(save)
+        grid_size = saved.grid_size
+        fleet_spec = saved.fleet_spec
+    
+    view_size = view
+    profiler = FrameProfiler(record=profile != None)
+    replay = None
+    if replay_path != None:
+        replay = ReplayWriter(replay_path)
+    
+    pygame.init()
+    clock = pygame.time.Clock()
+    
     setup()
+    if saved != None:
+        load_game(saved)
     
-    global game_state, turn_length
+    global redraw_all
     
     while True:
+        profiler.start_frame()
+        
         #Process inputs
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if profile != None:
+                    profiler.export(profile)
+                if replay != None:
+                    replay.close()
+                if remote != None:
+                    remote.close()
+                if save_path != None:
+                    savegame.save(save_path, save_game())
                 pygame.quit()
                 raise SystemExit
             
+            # show or hide the frame timings
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle()
+            
+            # draw the whole window again if it was covered up
+            elif event.type == pygame.VIDEOEXPOSE:
+                redraw_all = True
+            
+            # scroll the board under the mouse if it is bigger than its view
+            elif event.type == pygame.MOUSEWHEEL:
+                board = board_under(pygame.mouse.get_pos())
+                if board != None:
+                    board.scroll(event.x, -event.y)
+                    
+            elif event.type == pygame.KEYDOWN and event.key in SCROLL_KEYS:
+                board = board_under(pygame.mouse.get_pos())
+                if board != None:
+                    board.scroll(*SCROLL_KEYS[event.key])
+            
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 
                 # handle left clicks
                 if pygame.mouse.get_pressed()[0] == True:
                     
-                    if game_state == 'setup' or game_state == 'ready':
+                    if game.state == 'setup' or game.state == 'ready':
                         # check if ships are dragged
                         for s in player_board.ships:
                             if s.check_clicked(pygame.mouse.get_pos()):
-                                # reset tiles occupied by the ship if it was
-                                # already on the board
+                                # take the ship off the board while it is
+                                # dragged if it was already on the board
                                 if s.main_tile != None:
                                     player_board.erase_ship(s)
                                 pygame.mouse.get_rel()
@@ -506,28 +682,21 @@ def main():
                         # check if ready button is clicked
                         ready_button.check_clicked(pygame.mouse.get_pos())
                     
-                    elif game_state == 'player turn':
-                        # check if opponent tiles are clicked
-                        if opponent_board.check_clicked(pygame.mouse.get_pos()):
-                            for column in opponent_board.tiles:
-                                for tile in column:
-                                    # guess the tile if it was clicked
-                                    if (tile.check_clicked(pygame.mouse.get_pos())
-                                            and not tile.guessed):
-                                        # guess tile
-                                        opponent_board.guess(tile.column,
-                                                             tile.row)
-                                        
-                                        # make the ship visible once it is sunk
-                                        if tile.ship != None and tile.ship.sunk:
-                                            tile.ship.set_visible(True)
-                                            turn_length = 2
-                                            
-                                        global tile_clicked
-                                        tile_clicked = True
-                                        break
+                    elif (game.state == 'player turn'
+                            and not game.tile_clicked
+                            and not game.awaiting_result):
+                        # guess the opponent's tile if one was clicked. the
+                        # server has to say what it hit first when playing
+                        # on one
+                        tile = opponent_board.tile_at(pygame.mouse.get_pos())
+                        if tile != None and not tile.guessed:
+                            if remote != None:
+                                remote.send_guess(tile.column, tile.row)
+                                game.awaiting_result = True
+                            else:
+                                player_guess(tile.column, tile.row)
                             
-                    elif game_state == 'game over':
+                    elif game.state == 'game over':
                         # check if play again button is clicked
                         play_again_button.check_clicked(pygame.mouse.get_pos())
                             
@@ -535,7 +704,7 @@ def main():
                 # handle right clicks
                 elif pygame.mouse.get_pressed()[2] == True:
                     
-                    if game_state == 'setup' or game_state == 'ready':
+                    if game.state == 'setup' or game.state == 'ready':
                         # check if player ships are rotated
                         for s in player_board.ships:
                             if s.check_right_clicked(pygame.mouse.get_pos()):
@@ -543,86 +712,132 @@ def main():
                                 if s.main_tile == None:
                                     s.rotate()
                                 else:
-                                    # rotate ship and reset its old tiles if it
-                                    # was already on the board
-                                    player_board.erase_ship(s)
+                                    # rotate ship in place if it was already on
+                                    # the board and still fits once rotated
+                                    horizontal = s.horizontal
                                     if player_board.ship_at_valid_position(
                                                     s.main_tile, s,
                                                     not s.horizontal):
-                                        s.rotate()
+                                        horizontal = not s.horizontal
+                                    
+                                    if s.dragged:
+                                        # the ship is off the board while it
+                                        # is dragged, so only turn it
+                                        if horizontal != s.horizontal:
+                                            s.rotate()
+                                    else:
+                                        player_board.place_ship(s, s.main_tile,
+                                                                horizontal,
+                                                                False)
                                 break
             
             
             # handle mouse button releases
             elif event.type == pygame.MOUSEBUTTONUP:
                 
-                if game_state == 'setup' or game_state == 'ready':
+                if game.state == 'setup' or game.state == 'ready':
                     # check if ships are released after being dragged 
                     for s in player_board.ships:
                         if s.dragged:
                             s.set_dragging(False)
                             
                             # check if ship is in a valid position before
-                            # placing
-                            done = False
+                            # placing. the first tile under the ship is its
+                            # top left tile
                             valid = False
-                            for column in player_board.tiles:
-                                for t in column:
-                                    if t.overlaps(s):
-                                        if player_board.ship_at_valid_position(
-                                                        t, s, s.horizontal):
-                                            # place ship at the right tile if it
-                                            # is valid
-                                            s.place_at(t)
-                                            valid = True
-                                        done = True
-                                        break
-                                if done:
-                                    break
+                            under = player_board.tiles_under(s.rect)
+                            if under:
+                                t = under[0]
+                                if player_board.ship_at_valid_position(
+                                                t, s, s.horizontal):
+                                    # place ship at the right tile if it is
+                                    # valid
+                                    player_board.place_ship(s, t)
+                                    valid = True
                             
                             # send ship back to previous position if new
                             # position is not valid
                             if not valid:
-                                s.glide_to_default_position()
+                                if s.main_tile != None:
+                                    player_board.place_ship(s, s.main_tile)
+                                else:
+                                    s.glide_to_default_position()
                                     
                     # reset any tiles that a ship hovered over
-                    for column in player_board.tiles:
-                        for t in column:
-                            t.cancel_hovered()
+                    player_board.cancel_hovered()
 
             
             # handle mouse movement
             elif event.type == pygame.MOUSEMOTION:
                 
-                if game_state == 'setup' or game_state == 'ready':
+                if game.state == 'setup' or game.state == 'ready':
                     # check if ships are moved while being dragged
                     for s in player_board.ships:
                         if s.dragged == True:
                             s.drag(pygame.mouse.get_rel())
                             
                             # update tiles that the ship hovers over
-                            for column in player_board.tiles:
-                                for t in column:
-                                    t.check_hovered(s)
+                            player_board.hover(s)
                             break
                         
                     # check if ready button is hovered over
                     ready_button.check_hovered(pygame.mouse.get_pos())
                     
-                elif game_state == 'game over':
+                elif game.state == 'game over':
                     # check if play again button is hovered over
                     play_again_button.check_hovered(pygame.mouse.get_pos())
         
+        profiler.mark('events')
+        
         # handle game locic and display
-        player_board.update()
-        opponent_board.update()
+        animator.run()
+        profiler.mark('update')
         
+        scheduler.run()
         control_game_flow()
+        profiler.mark('game flow')
             
-        screen.fill('white')    
         render_graphics()
+        profiler.mark('render')
         
         clock.tick(60)
+        profiler.mark('tick')
+        profiler.end_frame()
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Play battleship against '
+                                                 'the computer.')
+    parser.add_argument('--strong', action='store_true',
+                        help='play a harder opponent that uses every CPU')
+    parser.add_argument('--grid', type=int, default=10,
+                        help='tiles across each board (default 10)')
+    parser.add_argument('--fleets', type=int, default=None,
+                        help='copies of the standard five ships (default one'
+                             ' for every 10 tiles across)')
+    parser.add_argument('--view', type=int, default=10,
+                        help='tiles across shown at a time. bigger boards'
+                             ' scroll (default 10)')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write the time each frame took to a .json or'
+                             ' .csv file when the game is closed')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='add every game played to a replay log')
+    parser.add_argument('--save', metavar='FILE',
+                        help='save the game to a file after every turn, and'
+                             ' carry on from it if it exists')
+    parser.add_argument('--server', metavar='HOST:PORT',
+                        help='play against an opponent on a server started'
+                             ' with server.py')
+    parser.add_argument('--versus', choices=('computer', 'player'),
+                        default='computer',
+                        help="who to play on the server (default the"
+                             " server's computer)")
+    args = parser.parse_args()
+    
+    server = None
+    if args.server != None:
+        host, _, port = args.server.rpartition(':')
+        server = (host or '127.0.0.1', int(port))
+    
+    main(args.strong, args.grid, args.fleets or max(1, args.grid // 10),
+         args.view, args.profile, args.replay, args.save, server, args.versus)
@@ -0,0 +1,354 @@
+import random
+
+from engine import LAYOUT_BACKTRACKS, BoardModel
+
+
+# the masks that only depend on the grid size, worked out once for each size
+# and shared by every board of that size
+shared_masks = {}
+
+
+class BitBoardModel(BoardModel):
+
+    __slots__ = ('stride', 'full', 'horizontal_shapes', 'vertical_shapes',
+                 'in_bounds_anchors', 'masks', 'halos', 'occupied', 'blocked',
+                 'guessed_mask', 'hit_mask', 'miss_mask', 'legal')
+
+    def __init__(self, grid_size=10):
+        """Sets up an empty board that keeps its state in integer bitmasks as
+        well as the lists used by BoardModel.
+        Bits are laid out column by column with one spare bit at the end of
+        each column, so shifting a mask up or down a row never wraps into the
+        next column.
+        """
+
+        BoardModel.__init__(self, grid_size)
+
+        self.stride = grid_size + 1
+
+        if grid_size not in shared_masks:
+            shared_masks[grid_size] = self.make_shared_masks()
+        (self.full, self.horizontal_shapes, self.vertical_shapes,
+         self.in_bounds_anchors) = shared_masks[grid_size]
+
+        self.clear_masks()
+
+    def make_shared_masks(self):
+        """Returns the mask of every cell on the board, the shapes of ships
+        of each length and the anchors that keep them on the board.
+        """
+
+        grid_size = self.grid_size
+
+        # a mask with a bit set for every cell that is on the board
+        column_mask = (1 << grid_size) - 1
+        full = 0
+        for c in range(grid_size):
+            full |= column_mask << (c * self.stride)
+
+        # the shape of a ship of each length with its top left cell at A1
+        horizontal_shapes = [0]
+        vertical_shapes = [0]
+        for length in range(1, grid_size + 1):
+            last_cell = 1 << ((length - 1) * self.stride)
+            horizontal_shapes.append(horizontal_shapes[-1] | last_cell)
+            vertical_shapes.append((1 << length) - 1)
+
+        # masks of the anchors that keep a ship of each length on the board
+        in_bounds_anchors = {}
+        for length in range(1, grid_size + 1):
+            horizontal = 0
+            for c in range(grid_size - length + 1):
+                horizontal |= column_mask << (c * self.stride)
+            vertical = 0
+            for c in range(grid_size):
+                vertical |= ((1 << (grid_size - length + 1)) - 1) << (
+                    c * self.stride)
+            in_bounds_anchors[length, True] = horizontal
+            in_bounds_anchors[length, False] = vertical
+
+        return full, horizontal_shapes, vertical_shapes, in_bounds_anchors
+
+    def clear_masks(self):
+        """Empties every mask."""
+
+        # one mask per ship for the cells it covers, and one for the cells it
+        # covers plus every cell around it
+        self.masks = {}
+        self.halos = {}
+
+        self.occupied = 0
+        self.blocked = 0
+        self.guessed_mask = 0
+        self.hit_mask = 0
+        self.miss_mask = 0
+
+        # masks of the anchors where a ship of a certain length and
+        # orientation could go, keyed by (length, horizontal). an entry is
+        # worked out the first time it is needed and thrown away whenever a
+        # ship is placed or removed
+        self.legal = {}
+
+    def reset(self):
+        """Takes every ship off the board and clears every guess."""
+
+        BoardModel.reset(self)
+        self.clear_masks()
+
+    def bit(self, column, row):
+        """Returns a mask with only the bit for one cell set."""
+
+        return 1 << (column * self.stride + row)
+
+    def spread(self, mask):
+        """Returns a mask with every cell in the given mask and every cell
+        around them set.
+        """
+
+        stride = self.stride
+        mask |= (mask << 1) | (mask >> 1)
+        mask |= (mask << stride) | (mask >> stride)
+        return mask & self.full
+
+    def cells_in(self, mask):
+        """Returns a list of the flat BoardModel indexes of the cells in a
+        mask.
+        """
+
+        gs = self.grid_size
+        stride = self.stride
+        cells = []
+
+        while mask:
+            low = mask & -mask
+            column, row = divmod(low.bit_length() - 1, stride)
+            cells.append(column * gs + row)
+            mask ^= low
+
+        return cells
+
+    def shape(self, ship, column, row, horizontal):
+        """Returns the mask a ship would cover with its top left cell at a
+        certain column and row, or 0 if it would hang off the board.
+        """
+
+        gs = self.grid_size
+        if column < 0 or row < 0 or column >= gs or row >= gs:
+            return 0
+
+        if horizontal:
+            if column + ship.length > gs:
+                return 0
+            shape = self.horizontal_shapes[ship.length]
+        else:
+            if row + ship.length > gs:
+                return 0
+            shape = self.vertical_shapes[ship.length]
+
+        return shape << (column * self.stride + row)
+
+    def adjacent_ships(self, column, row):
+        """Returns a list of the ships in a cell and the cells around it."""
+
+        bit = 1 << (column * self.stride + row)
+        if not self.blocked & bit:
+            return []
+
+        return [ship for ship, halo in self.halos.items() if halo & bit]
+
+    def halo(self, ship):
+        """Returns a list of the indexes of the cells a ship covers and every
+        cell around it.
+        """
+
+        return self.cells_in(self.halos.get(ship, 0))
+
+    def legal_mask(self, length, horizontal, blocked=None):
+        """Returns a mask of every anchor where a ship of a certain length
+        and orientation could go. Uses the board's blocked cells unless a
+        different blocked mask is given.
+        """
+
+        if blocked == None:
+            if (length, horizontal) in self.legal:
+                return self.legal[length, horizontal]
+            mask = self.legal_mask(length, horizontal, self.blocked)
+            self.legal[length, horizontal] = mask
+            return mask
+
+        # an anchor is no good if any cell the ship would cover is blocked,
+        # so slide the blocked mask back over each of those cells
+        step = self.stride if horizontal else 1
+        bad = 0
+        for k in range(length):
+            bad |= blocked >> (k * step)
+
+        return self.in_bounds_anchors[length, horizontal] & ~bad
+
+    def legal_anchors(self, ship, horizontal):
+        """Returns a list of the (column, row) of every top left cell where
+        a ship could go with a certain orientation. The ship's own cells are
+        ignored.
+        """
+
+        if ship.length > self.grid_size:
+            return []
+
+        if ship in self.masks:
+            blocked = self.spread(self.occupied ^ self.masks[ship])
+            mask = self.legal_mask(ship.length, horizontal, blocked)
+        else:
+            mask = self.legal_mask(ship.length, horizontal)
+
+        return [divmod(i, self.grid_size) for i in self.cells_in(mask)]
+
+    def can_place(self, ship, column, row, horizontal):
+        """Checks whether a ship could go with its top left cell at a certain
+        column and row. Returns False if the ship would hang off the board,
+        overlap another ship, or be right next to another ship. The ship's own
+        cells are ignored so ships can be moved or rotated in place.
+        """
+
+        if ship in self.masks:
+            # work out the blocked cells without this ship on the board
+            shape = self.shape(ship, column, row, horizontal)
+            if not shape:
+                return False
+            return not shape & self.spread(self.occupied ^ self.masks[ship])
+
+        gs = self.grid_size
+        if (column < 0 or row < 0 or column >= gs or row >= gs
+                or ship.length > gs):
+            return False
+
+        legal = self.legal_mask(ship.length, horizontal)
+        return (legal >> (column * self.stride + row)) & 1 == 1
+
+    def place_ship(self, ship, column, row, horizontal):
+        """Puts a ship on the board with its top left cell at a certain column
+        and row. Moves the ship if it was already on the board.
+        Raises ValueError if the position is not valid.
+        """
+
+        BoardModel.place_ship(self, ship, column, row, horizontal)
+
+        mask = self.shape(ship, column, row, horizontal)
+        self.masks[ship] = mask
+        self.halos[ship] = self.spread(mask)
+        self.occupied |= mask
+        self.blocked = self.spread(self.occupied)
+        self.legal = {}
+
+    def remove_ship(self, ship):
+        """Takes a ship off the board. Does nothing if it isn't on the board.
+        """
+
+        BoardModel.remove_ship(self, ship)
+
+        if ship in self.masks:
+            self.occupied ^= self.masks.pop(ship)
+            del self.halos[ship]
+            self.blocked = self.spread(self.occupied)
+            self.legal = {}
+
+    def try_layout(self, rng=random, backtracks=LAYOUT_BACKTRACKS):
+        """Tries to place every ship in the fleet at a random valid
+        position. Each ship is put at one of the positions still open to it,
+        chosen uniformly, and if a ship has nowhere left to go the ship
+        before it is moved instead. Returns False if that happened more than
+        backtracks times, and True once every ship is placed.
+        Raises ValueError if every possibility was tried, so the fleet cannot
+        fit at all.
+        """
+
+        for ship in self.ships:
+            self.remove_ship(ship)
+
+        ships = self.ships
+        random_number = rng.random
+
+        # masks of the horizontal and vertical anchors each ship hasn't tried
+        # yet
+        options = [None] * len(ships)
+
+        i = 0
+        while i < len(ships):
+            ship = ships[i]
+            if options[i] is None:
+                if ship.length > self.grid_size:
+                    options[i] = (0, 0)
+                else:
+                    options[i] = (self.legal_mask(ship.length, True),
+                                  self.legal_mask(ship.length, False))
+            across, down = options[i]
+
+            across_count = across.bit_count()
+            total = across_count + down.bit_count()
+
+            if total:
+                # pick the k-th untried anchor by clearing the k lowest bits
+                k = int(random_number() * total)
+                horizontal = k < across_count
+                if horizontal:
+                    mask = across
+                else:
+                    mask = down
+                    k -= across_count
+                for _ in range(k):
+                    mask &= mask - 1
+                bit = mask & -mask
+
+                if horizontal:
+                    options[i] = (across ^ bit, down)
+                else:
+                    options[i] = (across, down ^ bit)
+
+                column, row = divmod(bit.bit_length() - 1, self.stride)
+                self.place_ship(ship, column, row, horizontal)
+                i += 1
+            else:
+                # go back and move the previous ship somewhere else
+                options[i] = None
+                i -= 1
+                if i < 0:
+                    raise ValueError('the fleet does not fit on the board')
+                self.remove_ship(ships[i])
+                backtracks -= 1
+                if backtracks < 0:
+                    return False
+
+        return True
+
+    def guess(self, column, row):
+        """Guesses a cell. Returns the ship that was hit, or None if it is a
+        miss. When a ship is sunk every cell around it is marked as guessed,
+        since there can't be another ship right next to it.
+        Raises ValueError if the cell was already guessed.
+        """
+
+        bit = 1 << (column * self.stride + row)
+        if self.guessed_mask & bit:
+            raise ValueError(f'column {column}, row {row} was already guessed')
+
+        self.guessed_mask |= bit
+        self.guessed[column * self.grid_size + row] = 1
+
+        if not self.occupied & bit:
+            self.miss_mask |= bit
+            self.misses += 1
+            return None
+
+        self.hit_mask |= bit
+        ship = self.occupant[column * self.grid_size + row]
+        self.record_hit(ship)
+
+        if ship.sunk:
+            # everything around the ship that hasn't been guessed is a miss
+            misses = self.halos[ship] & ~self.guessed_mask
+            self.guessed_mask |= misses
+            self.miss_mask |= misses
+            guessed = self.guessed
+            for i in self.cells_in(misses):
+                guessed[i] = 1
+
+        return ship
@@ -1,79 +1,80 @@
 import pygame
 import time
 
-from tile import Tile
+import assets
+from bitboard import BitBoardModel
+from engine import BoardModel
+from sparse import SparseBoardModel
+from tile import Tile, column_label, tile_sprites
 from ship import Ship
 
 class Board:
-    def __init__(self, w, gs, turn_length, title='', pb=False):
+    def __init__(self, w, gs, turn_length, title='', pb=False,
+                 bitboard=False, sparse=False, view_size=None, model=None):
         """Sets up a grid of a specified size to fit inside the width given.
         Sets up letter labels for columns and number labels for rows.
         Gives the board a title.
+        Keeps the board's state in bitmasks if bitboard=True, or only stores
+        the cells with ships in them if sparse=True.
+        If view_size is smaller than the grid, only that many columns and rows
+        are shown at a time and the view can be scrolled.
+        A model can be given to use instead, such as a RemoteBoardModel.
         """
         
         self.is_player_board = pb
         
+        # the model keeps track of where the ships are and which tiles have
+        # been guessed. everything else in the board is for displaying it
+        if model != None:
+            self.model = model
+        elif sparse:
+            self.model = SparseBoardModel(gs)
+        elif bitboard:
+            self.model = BitBoardModel(gs)
+        else:
+            self.model = BoardModel(gs)
+        
         self.grid_size = gs
-        self.tile_size = w // (gs + 1)
-        self.width = self.tile_size * (self.grid_size + 1)
-        self.height = self.tile_size * (self.grid_size + 2)
-        self.tiles = []
+        
+        # the part of the grid that is shown, from its top left tile
+        self.view_size = min(gs, view_size or gs)
+        self.view_column = 0
+        self.view_row = 0
+        self.scrolls = self.view_size < gs
+        
+        self.tile_size = w // (self.view_size + 1)
+        self.width = self.tile_size * (self.view_size + 1)
+        self.height = self.tile_size * (self.view_size + 2)
+        
+        # tiles are only made when they are needed, keyed by their index
+        self.tiles = {}
             
         self.board_x = 0
         self.board_y = 0
-        self.grid_rect = pygame.Rect(0, 0, self.tile_size * self.grid_size,
-                                     self.tile_size * self.grid_size)
+        self.grid_rect = pygame.Rect(0, 0, self.tile_size * self.view_size,
+                                     self.tile_size * self.view_size)
         self.set_pos(0, 0)
             
         self.ships = []
             
         # display the title of the board on the board's surface
-        font = pygame.font.SysFont('arial', int(self.tile_size * 0.8))
-        title_surface = pygame.Surface((self.tile_size * (self.grid_size + 1),
-                                        self.tile_size))
+        title_surface = pygame.Surface((self.width, self.tile_size))
         title_surface.fill('white')
-        text = font.render(title, True, 'black')
+        text = assets.render_text(title, int(self.tile_size * 0.8))
         text_rect = text.get_rect()
         text_rect.center = title_surface.get_rect().center
         title_surface.blit(text, text_rect)
         
-        # display the letter labels on the board's surface
-        font = pygame.font.SysFont('arial', self.tile_size // 2)
-        letter_labels = pygame.Surface((self.tile_size * self.grid_size,
-                                        self.tile_size))
-        letter_labels.fill('white')
-        
-        for x in range(self.grid_size):
-            text = font.render(chr(65 + x), True, 'black')
-            outer_rect = pygame.Rect(x * self.tile_size, 0, self.tile_size,
-                                     self.tile_size)
-            text_rect = text.get_rect()
-            text_rect.center = outer_rect.center
-            letter_labels.blit(text, text_rect)
-        
-        # display the number labels on the board's surface
-        number_labels = pygame.Surface((self.tile_size,
-                                        self.tile_size * self.grid_size))
-        number_labels.fill('white')
-            
-        for y in range(self.grid_size):
-            text = font.render(str(y+1), True, 'black')
-            outer_rect = pygame.Rect(0, y * self.tile_size, self.tile_size,
-                                     self.tile_size)
-            text_rect = text.get_rect()
-            text_rect.center = outer_rect.center
-            number_labels.blit(text, text_rect)
-        
-        # display each tile on the board's surface
-        self.grid = pygame.Surface((self.tile_size * self.grid_size,
-                                    self.tile_size * self.grid_size))
+        # the indexes of the tiles that may look different since they were
+        # last drawn, and the picture each place in the view was last drawn
+        # with
+        self.redraw_tiles = set(self.visible_cells())
+        self.drawn_sprites = [None] * (self.view_size * self.view_size)
+        self.changed_sprites = []
+        self.moved = False
         
-        for c in range(self.grid_size):
-            column = []
-            for r in range(self.grid_size):
-                tile = Tile(self, c, r, self.tile_size)
-                column.append(tile)
-            self.tiles.append(column)
+        # the tiles a dragged ship is hovering over
+        self.hovered_tiles = set()
         
         # add a surface for text below the board
         self.text = pygame.Surface((0, 0))
@@ -82,23 +83,113 @@ class Board:
         self.previous_time = 0
         self.has_text = False
         
+        # where the text was the last time it was drawn, to tell which parts
+        # of the screen need redrawing
+        self.drawn_text_rect = None
+        self.text_changed = True
+        
         # create the main surface to contain the title, labels, and tile grid
-        self.surface = pygame.Surface((self.tile_size * (self.grid_size + 1),
-                                       int(self.tile_size * (self.grid_size + 2))))
+        self.surface = pygame.Surface((self.width, self.height))
         self.surface.fill('white')
         self.surface.blit(title_surface, (0, 0))
-        self.surface.blit(letter_labels, (self.tile_size, self.tile_size))
-        self.surface.blit(number_labels, (0, self.tile_size * 2))
-        self.surface.blit(self.grid, (self.tile_size, self.tile_size * 2))
+        self.draw_labels()
         
         self.turn_length = turn_length
         
+        # a ReplayWriter that placements and guesses are recorded to, and
+        # which side of the game this board is in it
+        self.replay = None
+        self.side = 0 if pb else 1
+        
+        # the index of every tile guessed, in order, for saving the game
+        self.shots = []
+        
+        # the Animator ships added to the board glide with
+        self.animator = None
+        
     def reset(self):
-        """Resets each tile on the board."""
+        """Takes every ship off the board, clears every guess and resets each
+        tile on the board.
+        """
+        
+        self.model.reset()
+        self.shots = []
         
-        for column in self.tiles:
-            for tile in column:
-                tile.reset()
+        for tile in self.tiles.values():
+            tile.reset()
+        
+        self.hovered_tiles = set()
+        self.redraw_tiles.update(self.visible_cells())
+        
+    def draw_labels(self):
+        """Displays the letter labels for the columns and the number labels
+        for the rows in view on the board's surface.
+        """
+        
+        ts = self.tile_size
+        font_size = ts // 2
+        
+        # display the letter labels on the board's surface
+        letter_labels = pygame.Surface((ts * self.view_size, ts))
+        letter_labels.fill('white')
+        
+        for x in range(self.view_size):
+            text = assets.render_text(column_label(self.view_column + x),
+                                      font_size)
+            outer_rect = pygame.Rect(x * ts, 0, ts, ts)
+            text_rect = text.get_rect()
+            text_rect.center = outer_rect.center
+            letter_labels.blit(text, text_rect)
+        
+        # display the number labels on the board's surface
+        number_labels = pygame.Surface((ts, ts * self.view_size))
+        number_labels.fill('white')
+            
+        for y in range(self.view_size):
+            text = assets.render_text(str(self.view_row + y + 1), font_size)
+            outer_rect = pygame.Rect(0, y * ts, ts, ts)
+            text_rect = text.get_rect()
+            text_rect.center = outer_rect.center
+            number_labels.blit(text, text_rect)
+            
+        self.surface.blit(letter_labels, (ts, ts))
+        self.surface.blit(number_labels, (0, ts * 2))
+        
+    def visible_cells(self):
+        """Returns a list of the indexes of the cells in view."""
+        
+        gs = self.grid_size
+        rows = range(self.view_row, self.view_row + self.view_size)
+        return [c * gs + r
+                for c in range(self.view_column,
+                               self.view_column + self.view_size)
+                for r in rows]
+        
+    def scroll(self, columns, rows):
+        """Moves the view by a number of columns and rows, keeping it on the
+        grid. Ships on the board move with it. Returns True if the view
+        moved.
+        """
+        
+        limit = self.grid_size - self.view_size
+        column = min(max(self.view_column + columns, 0), limit)
+        row = min(max(self.view_row + rows, 0), limit)
+        if column == self.view_column and row == self.view_row:
+            return False
+        
+        self.view_column = column
+        self.view_row = row
+        self.set_pos(self.board_x, self.board_y)
+        
+        for ship in self.ships:
+            if ship.main_tile != None and not ship.dragged:
+                ship.set_position(ship.main_tile.rect.x,
+                                  ship.main_tile.rect.y)
+        
+        self.draw_labels()
+        self.redraw_tiles.update(self.visible_cells())
+        self.moved = True
+        return True
         
     def set_pos(self, x, y):
         """Set's the board's position inside the window."""
@@ -108,18 +199,15 @@ class Board:
         self.grid_rect.update(x + self.tile_size, y + (self.tile_size * 2),
                               self.grid_rect.width, self.grid_rect.height)
         
-        for column in self.tiles:
-            for tile in column:
-                tile.set_pos(self.grid_rect)
+        for tile in self.tiles.values():
+            tile.set_pos(self.grid_rect)
                 
     def set_text(self, line):
         """Displays text under the board to tell the player whether a guess is
         a hit or a miss.
         """
         
-        font = pygame.font.SysFont('arial', self.tile_size // 2)
-        self.text.fill('white')
-        self.text = font.render(line, True, 'black')
+        self.text = assets.render_text(line, self.tile_size // 2)
         self.text_rect = self.text.get_rect()
         self.text_rect.center = self.grid_rect.center
         self.text_rect.y = self.board_y + self.height + (self.tile_size // 2)
@@ -127,31 +215,48 @@ class Board:
         # sets a timer to make to text go away after 1 turn length
         self.previous_time = time.time()
         self.has_text = True
+        self.text_changed = True
         
     def add_ship(self, name, length, x=0, y=0, show=True, locked=False):
         """Adds a ship to self.ships without placing it at a specific tile."""
         
-        ship = Ship(name, length, self.tile_size, x, y, show, locked)
+        ship = Ship(name, length, self.tile_size, x, y, show, locked,
+                    self.animator)
         self.ships.append(ship)
+        self.model.add_ship(ship)
+        
+    def place_ship(self, ship, tile, horizontal=None, glide=True):
+        """Puts a ship on the board with its top left corner at a tile, moving
+        it if it was already on the board. The ship glides to the tile unless
+        glide=False. Raises ValueError if the position is not valid.
+        """
+        
+        if horizontal == None:
+            horizontal = ship.horizontal
+        if horizontal != ship.horizontal:
+            ship.rotate()
+            
+        self.model.place_ship(ship, tile.column, tile.row, horizontal)
+        
+        if self.replay != None:
+            self.replay.place(self.side, self.ships.index(ship), tile.column,
+                              tile.row, horizontal)
+        
+        if glide:
+            ship.place_at(tile)
+        else:
+            ship.place_directly_at(tile, horizontal)
 
     def erase_ship(self, ship):
-        """Takes a ship off the board and resets all the tiles the ship was on.
+        """Takes a ship off the board. The ship remembers its main tile so it
+        can be put back if it isn't moved somewhere valid.
         """
         
-        if ship.main_tile != None:
-            column = ship.main_tile.column
-            row = ship.main_tile.row
-            
-            for _ in range(ship.length):
-                t = self.tiles[column][row]
-                
-                t.ship = None 
-                
-                if ship.horizontal:
-                    column += 1
-                else:
-                    row += 1
-                    
+        self.model.remove_ship(ship)
+        
+        if self.replay != None:
+            self.replay.remove(self.side, self.ships.index(ship))
+        
     def check_clicked(self, coords):
         """Returns True if the grid of tiles is clicked. Returns False
         otherwise.
@@ -159,6 +264,68 @@ class Board:
         
         return self.grid_rect.collidepoint(coords)
 
+    def tile_at(self, coords):
+        """Returns the tile at a point on the screen, or None if the point is
+        not on the grid of tiles.
+        """
+        
+        if not self.grid_rect.collidepoint(coords):
+            return None
+        
+        column = (coords[0] - self.grid_rect.x) // self.tile_size
+        row = (coords[1] - self.grid_rect.y) // self.tile_size
+        return self.get_tile(self.view_column + column, self.view_row + row)
+    
+    def tiles_under(self, rect):
+        """Returns a list of the tiles in view that a Rect covers more than
+        half of (the same tiles Tile.overlaps is True for), column by column.
+        """
+        
+        view = self.view_size
+        ts = self.tile_size
+        half = ts // 2
+        
+        # a tile is covered if the Rect starts before the middle of the tile
+        # and ends after it. measured from the grid, tile c is covered across
+        # if c * ts > left and c * ts < right
+        left = rect.left - self.grid_rect.x - ts + half
+        right = rect.right - self.grid_rect.x - half
+        top = rect.top - self.grid_rect.y - ts + half
+        bottom = rect.bottom - self.grid_rect.y - half
+        
+        first_column = max(0, left // ts + 1) + self.view_column
+        last_column = min(view - 1, -(-right // ts) - 1) + self.view_column
+        first_row = max(0, top // ts + 1) + self.view_row
+        last_row = min(view - 1, -(-bottom // ts) - 1) + self.view_row
+        
+        return [self.get_tile(c, r)
+                for c in range(first_column, last_column + 1)
+                for r in range(first_row, last_row + 1)]
+    
+    def hover(self, ship):
+        """Darkens the tiles a dragged ship is over and reverts the tiles it
+        has moved off of.
+        """
+        
+        if ship.dragged:
+            hovered = set(self.tiles_under(ship.rect))
+        else:
+            hovered = set()
+        
+        for t in self.hovered_tiles - hovered:
+            t.cancel_hovered()
+        for t in hovered:
+            t.set_hovered(True)
+            
+        self.hovered_tiles = hovered
+        
+    def cancel_hovered(self):
+        """Reverts every tile a ship hovered over to its original color."""
+        
+        for t in self.hovered_tiles:
+            t.cancel_hovered()
+        self.hovered_tiles = set()
+    
     def ship_at_valid_position(self, tile, ship, horizontal):
         """Checks whether a ship would be in a valid position if it is placed
         with its top left corner at a certain tile, and is either horizontal or
@@ -166,122 +333,119 @@ class Board:
         the ship overlaps another, or if the ship is right next to another ship.
         """
         
-        column = tile.column
-        row = tile.row
+        return self.model.can_place(ship, tile.column, tile.row, horizontal)
+    
+    def legal_anchors(self, ship, horizontal):
+        """Returns a list of the (column, row) of every tile where the top left
+        corner of a ship could go with a certain orientation.
+        """
         
-        for _ in range(ship.length):
-            # make sure the ship isn't hanging off the board
-            try:
-                t = self.tiles[column][row]
-            except IndexError:
-                return False
-            
-            # make sure the ship isn't overlapping another
-            if t.ship != None and t.ship != ship:
-                return False
-            
-            if horizontal == ship.horizontal:
-                # make sure the ship isn't right next to another in the case
-                # that it is already rotated to the correct orientation
-                if len(t.adjacent_ships) > 1:
-                    return False
-            else:
-                # make sure the ship isn't right next to another in the case
-                # that the user wants to rotate the ship
-                if len(t.adjacent_ships) > 0 and ship not in t.adjacent_ships:
-                    return False
-            
-            if horizontal:
-                column += 1
-            else:
-                row += 1
-            
-        return True
+        return self.model.legal_anchors(ship, horizontal)
     
     def guess(self, column, row):
         """Guesses a tile. Returns True if it is a hit and False if it is a
         miss.
         """
         
-        hit = self.tiles[column][row].guess()
+        # the model turns all of the tiles around a sunk ship into misses
+        # since there can't be another ship right next to it
+        ship = self.model.guess(column, row)
+        hit = ship != None
+        self.shots.append(self.model.index(column, row))
+        
+        if self.replay != None:
+            self.replay.guess(self.side, column, row)
+        self.redraw_tiles.add(self.model.index(column, row))
         
         # display appropriate text below the board to respond to a hit or miss
         if hit:
+            # put a red circle on the ship where the hit is
+            ship.hit(self.get_tile(column, row))
+            
             self.set_text('Hit!')
-            ship = self.tiles[column][row].ship
             if ship.sunk:
+                self.redraw_tiles.update(self.model.halo(ship))
                 if self.is_player_board:
                     self.set_text(f'Hit, your opponent sunk your {ship.name}')
                 else:
                     self.set_text(f"Hit! You sunk your opponent's {ship.name}!")
-                
-                # turns all of the tiles around the ship into misses since
-                # there can't be another ship right next to the ship that was
-                # just sunk
-                for column in self.tiles:
-                    for tile in column:
-                        if ship in tile.adjacent_ships and not tile.guessed:
-                            tile.guess()
         else:
             self.set_text('Miss')
         
         return hit
     
+    def restore(self, positions, shots, observe=None):
+        """Puts the board back the way it was saved, from the (column, row,
+        horizontal) of each ship, or None if it wasn't on the board, and the
+        index of each tile guessed in order. The guesses are made again
+        without any messages, and observe is called with the column, row and
+        ship hit (or None) of each one.
+        Tiles are only made for the ships and the hits on them.
+        """
+        
+        self.reset()
+        
+        for ship, position in zip(self.ships, positions):
+            if position != None:
+                column, row, horizontal = position
+                self.place_ship(ship, self.get_tile(column, row), horizontal,
+                                False)
+        
+        for i in shots:
+            column, row = divmod(i, self.grid_size)
+            ship = self.model.guess(column, row)
+            self.shots.append(i)
+            if self.replay != None:
+                self.replay.guess(self.side, column, row)
+            if ship != None:
+                ship.hit(self.get_tile(column, row))
+            if observe != None:
+                observe(column, row, ship)
+        
+        self.redraw_tiles.update(self.visible_cells())
+        self.moved = True
+        
     def get_tile(self, column, row):
-        """Returns a tile in the specified column and row. Returns None if the
-        tile is out of range.
+        """Returns a tile in the specified column and row, making it if it
+        hasn't been needed before. Returns None if the tile is out of range.
         """
         
-        if column < 0 or row < 0:
+        if not self.model.in_bounds(column, row):
             return None
         
-        try:
-            return self.tiles[column][row]
-        except IndexError:
-            return None
-
-    def update(self):
-        """Updates each tile to know whether it contains a ship and whether
-        there is a ship right next to it.
+        i = column * self.grid_size + row
+        tile = self.tiles.get(i)
+        if tile == None:
+            tile = Tile(self, column, row, self.tile_size)
+            tile.set_pos(self.grid_rect)
+            self.tiles[i] = tile
+        return tile
+    
+    def sprite_at(self, i):
+        """Returns the picture of the tile with a certain index in its current
+        state.
         """
         
-        # check if each tile contains contains a ship
-        for column in self.tiles:
-            for t in column:
-                done = False
-                for s in self.ships:
-                    if t.overlaps(s):
-                        t.ship = s
-                        done = True
-                        break
-                if not done:
-                    t.ship = None
-        
-        # check if each tile is adjacent to a ship
-        for column in self.tiles:
-            for test_tile in column:
-                # this loop cycles through every tile on the board
-                test_tile.adjacent_ships = []
-                for c in range(test_tile.column - 1, test_tile.column + 2):
-                    for r in range(test_tile.row - 1, test_tile.row + 2):
-                        # this loop cycles through every tile around the
-                        # test_tile
-                        comparison_tile = self.get_tile(c, r)
-                        # check if each tile adjacent to the test tile exists
-                        # and contains a ship
-                        if (comparison_tile != None
-                                and comparison_tile.ship != None):
-                            # make sure the tile's list of adjacent ships
-                            # doesn't already contain the ship
-                            if (comparison_tile.ship not in
-                                    test_tile.adjacent_ships):
-                                test_tile.adjacent_ships.append(
-                                    comparison_tile.ship)                    
+        sprites = tile_sprites(self.tile_size)
+        if self.model.guessed[i]:
+            if self.model.occupant[i] != None:
+                return sprites['hit']
+            return sprites['miss']
         
-    def draw(self, surf, x, y):
-        """Displays the board at a specific location on the screen.
-        (Used in addition to simply blitting onto the screen so that tiles can
-        have a known location on the screen and be clickable.)
+        tile = self.tiles.get(i)
+        if tile != None and tile.hovered:
+            return sprites['hovered']
+        return sprites['water']
+
+    def all_sunk(self):
+        """Returns True if every ship on the board has been sunk."""
+        
+        return self.model.all_sunk()
+
+    def changed_rects(self):
+        """Returns a list of the parts of the screen that need to be redrawn
+        because a tile was guessed or hovered over, the view scrolled, or the
+        text under the board changed, since the last time this was called.
         Erases text under the board after 1 turn length.
         """
         
@@ -290,15 +454,62 @@ class Board:
                                             + self.turn_length):
             self.set_text('')
             self.has_text = False
+            
+        rects = []
+        
+        # the whole board needs redrawing when the view scrolls
+        if self.moved:
+            rects.append(pygame.Rect(self.board_x, self.board_y, self.width,
+                                     self.height))
+            self.moved = False
+        
+        # work out which tiles in view now look different, so only they are
+        # drawn
+        gs = self.grid_size
+        ts = self.tile_size
+        view = self.view_size
+        for i in self.redraw_tiles:
+            column, row = divmod(i, gs)
+            column -= self.view_column
+            row -= self.view_row
+            if not (0 <= column < view and 0 <= row < view):
+                continue
+            
+            sprite = self.sprite_at(i)
+            slot = column * view + row
+            if sprite is not self.drawn_sprites[slot]:
+                self.drawn_sprites[slot] = sprite
+                self.changed_sprites.append(
+                    (sprite, ((column + 1) * ts, (row + 2) * ts)))
+                rects.append(pygame.Rect(self.grid_rect.x + column * ts,
+                                         self.grid_rect.y + row * ts, ts, ts))
+        self.redraw_tiles.clear()
+            
+        if self.text_changed:
+            if self.drawn_text_rect != None:
+                rects.append(self.drawn_text_rect)
+            self.drawn_text_rect = self.text_rect.copy()
+            rects.append(self.drawn_text_rect)
+            self.text_changed = False
+            
+        return rects
+        
+    def draw(self, surf, x, y):
+        """Displays the board at a specific location on the screen.
+        (Used in addition to simply blitting onto the screen so that tiles can
+        have a known location on the screen and be clickable.)
+        Only the tiles that changed are drawn again, all in one go.
+        """
+        
+        # set the position of the grid and each tile if the board moved
+        if x != self.board_x or y != self.board_y:
+            self.set_pos(x, y)
         
-        # set the position of the grid and each tile, then draw the tiles onto
-        # the board
-        self.set_pos(x, y)
-        for column in self.tiles:
-            for t in column:
-                t.draw(self.grid)
+        # draw the tiles that changed onto the board
+        if self.changed_sprites:
+            self.surface.blits(self.changed_sprites, False)
+            self.changed_sprites = []
         
         # draw the entire board
-        self.surface.blit(self.grid, (self.tile_size, self.tile_size * 2))
         surf.blit(self.surface, (x, y))
         surf.blit(self.text, self.text_rect)
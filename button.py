@@ -1,5 +1,7 @@
 import pygame
 
+import assets
+
 class Button:
     
     def __init__(self, x, y, w, h, func, color, name='', show=True):
@@ -24,6 +26,9 @@ class Button:
         
         self.show = show
         
+        # what the button looked like the last time it was drawn
+        self.drawn_state = None
+        
     def set_visible(self, s):
         """Makes the button visible or invisible.
         Button cannot be clicked unless it is visible.
@@ -79,6 +84,19 @@ class Button:
         
         return pygame.Color(r, g, b)
         
+    def changed_rects(self):
+        """Returns a list with the button's Rect if it was shown, hidden or
+        changed color since the last time this was called, and an empty list
+        otherwise.
+        """
+        
+        state = (self.show, tuple(self.color))
+        if state == self.drawn_state:
+            return []
+        
+        self.drawn_state = state
+        return [self.rect.copy()]
+        
     def draw(self, surf):
         """Displays the button if self.show=True.
         Writes the name on the button.
@@ -87,8 +105,8 @@ class Button:
         if self.show:
             self.surface.fill(self.color)
             
-            font = pygame.font.SysFont('arial', int(self.rect.height * 0.8))
-            text = font.render(self.name, True, self.border_color)
+            text = assets.render_text(self.name, int(self.rect.height * 0.8),
+                                      self.border_color)
             text_rect = text.get_rect()
             text_rect.center = self.surface.get_rect().center
             self.surface.blit(text, text_rect)
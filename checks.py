@@ -0,0 +1,186 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+import replay
+import savegame
+from engine import ShipModel
+
+
+def board_state(board):
+    """Returns everything about a BoardModel that a replay should bring
+    back, for comparing two boards.
+    """
+
+    ships = [(ship.column, ship.row, ship.horizontal, ship.hits, ship.sunk)
+             for ship in board.ships]
+    return (ships, bytes(board.guessed), board.ships_placed,
+            board.ships_sunk, board.cells_left, board.hits, board.misses)
+
+
+def replay_from_start(reader, number, turn):
+    """Returns both sides' BoardModels after a number of guesses in a game,
+    made by replaying every move from the start without using snapshots.
+    """
+
+    data = reader.read_game(number)
+    _, (grid_size, fleet_spec), _ = replay.read_record(data, 0)
+
+    boards = []
+    for _ in range(replay.SIDES):
+        board = reader.board_model(grid_size)
+        for name, length in fleet_spec:
+            board.add_ship(ShipModel(name, length))
+        boards.append(board)
+
+    current = 0
+    for move in reader.moves(number):
+        if move[0] == 'place':
+            _, side, n, column, row, horizontal = move
+            board = boards[side]
+            board.place_ship(board.ships[n], column, row, horizontal)
+        elif move[0] == 'remove':
+            _, side, n = move
+            boards[side].remove_ship(boards[side].ships[n])
+        else:
+            if current == turn:
+                break
+            _, side, column, row = move
+            boards[side].guess(column, row)
+            current += 1
+
+    return boards
+
+
+def check_snapshots(directory, games=20, seeks=200, seed=0):
+    """Records some games and checks that the boards state_at brings back
+    from a snapshot match replaying the game from the start, at the end of
+    every game and at random turns. Returns a list of what didn't match.
+    """
+
+    path = os.path.join(directory, 'snapshots.log')
+    replay.record_games(path, games, seed=seed, snapshot_every=8)
+    reader = replay.ReplayReader(path)
+
+    rng = random.Random(seed)
+    turns = [(number, game.turns) for number, game in enumerate(reader.games)]
+    for _ in range(seeks):
+        number = rng.randrange(len(reader.games))
+        turns.append((number, rng.randint(0, reader.games[number].turns)))
+
+    failures = []
+    for number, turn in turns:
+        seeked = reader.state_at(number, turn)
+        replayed = replay_from_start(reader, number, turn)
+        for side in range(replay.SIDES):
+            if board_state(seeked[side]) != board_state(replayed[side]):
+                failures.append(f'game {number} turn {turn} side {side}: '
+                                f'the snapshot and a full replay differ')
+    return failures
+
+
+def damaged_copies(data, rng, flips=200):
+    """Yields bytes that start like some data but are cut off at every
+    length, then copies of it with a random byte changed.
+    """
+
+    for size in range(len(data)):
+        yield 'cut off at', size, data[:size]
+
+    for _ in range(flips):
+        pos = rng.randrange(len(data))
+        damaged = bytearray(data)
+        damaged[pos] ^= rng.randrange(1, 256)
+        yield 'changed at', pos, bytes(damaged)
+
+
+def check_damaged_logs(directory, seed=0):
+    """Checks that a replay log which is cut off or has a damaged byte is
+    either read or refused with a ValueError, and that one cut off after a
+    whole game still has that game. Returns a list of what went wrong.
+    """
+
+    path = os.path.join(directory, 'damaged.log')
+    # two sessions, so there are two indexes chained together
+    replay.record_games(path, 2, seed=seed, snapshot_every=8)
+    replay.record_games(path, 2, seed=seed + 1, snapshot_every=8)
+    with open(path, 'rb') as f:
+        data = f.read()
+    games = replay.ReplayReader(path).games
+
+    failures = []
+    for how, pos, damaged in damaged_copies(data, random.Random(seed)):
+        with open(path, 'wb') as f:
+            f.write(damaged)
+        try:
+            reader = replay.ReplayReader(path)
+        except ValueError:
+            continue
+        except Exception as e:
+            failures.append(f'replay log {how} {pos}: {e!r}')
+            continue
+
+        if how == 'cut off at':
+            whole = sum(1 for game in games
+                        if game.offset + game.length <= pos)
+            if len(reader.games) < whole:
+                failures.append(f'replay log cut off at {pos}: '
+                                f'{len(reader.games)} of {whole} whole '
+                                f'games found')
+    return failures
+
+
+def check_damaged_saves(seed=0):
+    """Checks that a saved game which is cut off or has a damaged byte is
+    either loaded or refused with a ValueError. Returns a list of what went
+    wrong.
+    """
+
+    rng = random.Random(seed)
+    game = savegame.SavedGame()
+    game.state = 'player turn'
+    game.message = 'Your turn'
+    game.computer_seed = seed
+    for board in game.boards:
+        for _, length in game.fleet_spec:
+            board.ships.append(((rng.randrange(10), rng.randrange(10 - length)),
+                                False, True, True))
+        board.shots = rng.sample(range(100), 30)
+    data = savegame.dumps(game)
+
+    failures = []
+    for how, pos, damaged in damaged_copies(data, rng):
+        try:
+            savegame.loads(damaged)
+        except ValueError:
+            pass
+        except Exception as e:
+            failures.append(f'saved game {how} {pos}: {e!r}')
+    return failures
+
+
+def main(argv=None):
+    """Runs every check from the command line and prints what failed."""
+
+    parser = argparse.ArgumentParser(
+        description='Check that replay logs bring games back the way they '
+                    'were played, and that damaged replay logs and saved '
+                    'games are refused cleanly.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        failures = check_snapshots(directory, seed=args.seed)
+        failures += check_damaged_logs(directory, seed=args.seed)
+    failures += check_damaged_saves(seed=args.seed)
+
+    for failure in failures:
+        print(failure)
+    print(f'{len(failures)} failures')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import collections
+import json
+import random
+import socket
+import sys
+import time
+
+import fleet
+from engine import ShipModel
+from server import Server, decode, encode
+from sparse import SparseBoardModel
+from stats import percentile
+
+
+class UnknownShip(ShipModel):
+
+    def __init__(self):
+        """Stands in for the opponent's ships that have been hit but not
+        sunk, since which ship it is and where the rest of it is aren't known
+        yet.
+        """
+
+        ShipModel.__init__(self, 'ship', 0)
+
+    def hit(self, tile):
+        """There is no ship to draw the hit on yet."""
+
+        pass
+
+
+class RemoteBoardModel(SparseBoardModel):
+
+    def __init__(self, grid_size=10):
+        """Sets up the opponent's board in a match played on a server. The
+        ships are only put on it as they are sunk, since the server is the
+        only one who knows where they are.
+        """
+
+        SparseBoardModel.__init__(self, grid_size)
+        self.unknown = UnknownShip()
+
+    def prepare(self, column, row, hit, sunk=None, place=None):
+        """Gets ready for a guess the server has already answered, so making
+        the guess gives the same result. sunk is the [n, column, row,
+        horizontal] of the nth ship if the guess sinks it, which is put on
+        the board with place(ship, column, row, horizontal), or place_ship
+        if place isn't given.
+        Returns the indexes of the cells of a sunk ship that were hit before
+        it was known to be there.
+        """
+
+        if sunk == None:
+            if hit:
+                self.occupant[self.index(column, row)] = self.unknown
+            return []
+
+        n, column, row, horizontal = sunk
+        ship = self.ships[n]
+        step = self.grid_size if horizontal else 1
+        start = self.index(column, row)
+
+        # the unknown hits on the ship are really on this ship
+        earlier = []
+        for i in range(start, start + step * ship.length, step):
+            if self.occupant[i] is self.unknown:
+                del self.occupant[i]
+                earlier.append(i)
+
+        ship.hits = len(earlier)
+        (place or self.place_ship)(ship, column, row, horizontal)
+        return earlier
+
+
+class RemoteOpponent:
+
+    def __init__(self, address, opponent='computer'):
+        """Connects to a server at a (host, port) address to play against
+        the computer or another player there. The socket never blocks, so
+        the game loop can check it every frame.
+        """
+
+        self.opponent = opponent
+        self.socket = socket.create_connection(address)
+        self.socket.setblocking(False)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.received = b''
+        self.unsent = b''
+
+        # the opponent's guesses that haven't been made on the player's
+        # board yet
+        self.incoming = collections.deque()
+
+    def send(self, message):
+        """Sends a message to the server, or as much of it as fits, keeping
+        the rest for the next call to receive.
+        """
+
+        self.unsent += encode(message)
+        self.flush()
+
+    def flush(self):
+        """Sends as much of the waiting data as the socket will take."""
+
+        if self.unsent:
+            try:
+                sent = self.socket.send(self.unsent)
+            except BlockingIOError:
+                sent = 0
+            self.unsent = self.unsent[sent:]
+
+    def join(self, grid_size, fleets):
+        """Asks the server for a new match, leaving the one before."""
+
+        self.incoming.clear()
+        self.send({'type': 'join', 'opponent': self.opponent,
+                   'grid': grid_size, 'fleets': fleets})
+
+    def send_layout(self, ships):
+        """Tells the server where the player's ships are."""
+
+        self.send({'type': 'layout',
+                   'ships': [[ship.column, ship.row, ship.horizontal]
+                             for ship in ships]})
+
+    def send_guess(self, column, row):
+        """Tells the server the player's guess."""
+
+        self.send({'type': 'guess', 'column': column, 'row': row})
+
+    def receive(self):
+        """Returns a list of the messages that have arrived since the last
+        call, apart from the opponent's guesses, which are kept for poll.
+        A message saying the connection closed is added if it did, and a
+        line that can't be read becomes an error message.
+        """
+
+        self.flush()
+
+        closed = False
+        while True:
+            try:
+                data = self.socket.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b''
+            if not data:
+                closed = True
+                break
+            self.received += data
+
+        messages = []
+        *lines, self.received = self.received.split(b'\n')
+        for line in lines:
+            try:
+                message = decode(line)
+                if message['type'] == 'incoming':
+                    self.incoming.append((message['column'], message['row']))
+                    continue
+            except (ValueError, KeyError, TypeError):
+                message = {'type': 'error',
+                           'message': 'the server sent a message that '
+                                      'could not be read'}
+            messages.append(message)
+
+        if closed:
+            messages.append({'type': 'left'})
+        return messages
+
+    def poll(self, board):
+        """Returns the column and row of the opponent's next guess, or None
+        if it hasn't arrived yet.
+        """
+
+        if self.incoming:
+            return self.incoming.popleft()
+        return None
+
+    def observe(self, column, row, ship):
+        """The server already knows what the opponent's guesses hit."""
+
+        pass
+
+    def close(self):
+        """Disconnects from the server."""
+
+        self.socket.close()
+
+
+async def play_bot(host, port, opponent, grid_size=10, fleets=1, rng=random):
+    """Connects to a server and plays one match, guessing at random. Returns
+    a list of how long each guess took to be answered, in seconds.
+    """
+
+    reader, writer = await asyncio.open_connection(host, port)
+
+    def send(message):
+        writer.write(encode(message))
+
+    fleet_spec = fleet.repeat_fleet(fleets)
+    send({'type': 'join', 'opponent': opponent, 'grid': grid_size,
+          'fleets': fleets})
+
+    board = RemoteBoardModel(grid_size)
+    for name, length in fleet_spec:
+        board.add_ship(ShipModel(name, length))
+    order = list(range(grid_size * grid_size))
+    rng.shuffle(order)
+
+    def guess():
+        i = order.pop()
+        while board.guessed[i]:
+            i = order.pop()
+        column, row = divmod(i, grid_size)
+        send({'type': 'guess', 'column': column, 'row': row})
+        return time.perf_counter()
+
+    round_trips = []
+    sent = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        message = decode(line)
+        kind = message['type']
+
+        if kind == 'matched':
+            layout = fleet.random_layouts(1, grid_size, fleet_spec,
+                                          rng.random())[0]
+            send({'type': 'layout', 'ships': layout})
+        elif kind == 'start':
+            if message['your_turn']:
+                sent = guess()
+        elif kind == 'result':
+            round_trips.append(time.perf_counter() - sent)
+            board.prepare(message['column'], message['row'], message['hit'],
+                          message['sunk'])
+            board.guess(message['column'], message['row'])
+        elif kind == 'incoming':
+            sent = guess()
+        elif kind in ('over', 'left', 'error'):
+            break
+
+        await writer.drain()
+
+    writer.close()
+    return round_trips
+
+
+async def bench(matches, opponent='computer', grid_size=10, fleets=1):
+    """Starts a server on this machine, plays a number of matches against it
+    at the same time over the loopback interface and returns a dictionary of
+    how fast it was.
+    """
+
+    server = Server()
+    listener = await asyncio.start_server(server.handle, '127.0.0.1', 0,
+                                          backlog=matches * 2)
+    port = listener.sockets[0].getsockname()[1]
+
+    # two bots play each match between players
+    bots = matches if opponent == 'computer' else matches * 2
+
+    start = time.perf_counter()
+    async with listener:
+        results = await asyncio.gather(*[
+            play_bot('127.0.0.1', port, opponent, grid_size, fleets,
+                     random.Random(n))
+            for n in range(bots)])
+    seconds = time.perf_counter() - start
+
+    round_trips = sorted(t for result in results for t in result)
+    move_times = sorted(server.move_times)
+    return {
+        'matches': server.matches,
+        'seconds': seconds,
+        'moves': len(round_trips),
+        'moves_per_second': len(round_trips) / seconds,
+        'move_ms': {'p50': 1000 * percentile(move_times, 50),
+                    'p99': 1000 * percentile(move_times, 99),
+                    'max': 1000 * move_times[-1]},
+        'round_trip_ms': {'p50': 1000 * percentile(round_trips, 50),
+                          'p99': 1000 * percentile(round_trips, 99)},
+    }
+
+
+def main(argv=None):
+    """Plays a number of matches at once against a server on this machine
+    and prints how fast it handled them.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Load test a battleship server over the loopback '
+                    'interface.')
+    parser.add_argument('matches', type=int, nargs='?', default=1000,
+                        help='matches to play at once (default 1000)')
+    parser.add_argument('--versus', choices=('computer', 'player'),
+                        default='computer')
+    parser.add_argument('--grid', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(bench(args.matches, args.versus, args.grid,
+                                max(1, args.grid // 10)))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,632 @@
+import random
+
+# the ships in a standard game, in the order they are handed to the player
+DEFAULT_FLEET = (('carrier', 5),
+                 ('battleship', 4),
+                 ('submarine', 3),
+                 ('cruiser', 3),
+                 ('destroyer', 2))
+
+# how many times a random layout goes back to move an earlier ship before it
+# starts again from an empty board, and how many times it starts again before
+# giving up. a fleet that only just fits can take a very long time to lay out
+# by searching every possibility
+LAYOUT_BACKTRACKS = 200
+LAYOUT_RESTARTS = 5
+
+# how many random positions are tried for a ship before every position
+# open to it is listed. on a board with room to spare one of the first few
+# is nearly always free, which is much quicker than listing them all
+LAYOUT_TRIES = 20
+
+# the (grid size, ship lengths) of the fleets that no layout was found for,
+# so asking for them again fails straight away
+misfit_fleets = set()
+
+# the table of the cells around each cell for each grid size. the tables never
+# change, so every board of the same size shares one
+neighbour_tables = {}
+
+
+def cells_around(grid_size, column, row):
+    """Returns a tuple of the indexes of the (up to 8) cells around a cell."""
+
+    around = []
+    for c in range(column - 1, column + 2):
+        for r in range(row - 1, row + 2):
+            if ((c != column or r != row) and 0 <= c < grid_size
+                    and 0 <= r < grid_size):
+                around.append(c * grid_size + r)
+    return tuple(around)
+
+
+def fleet_fits(grid_size, lengths):
+    """Returns False if ships of the given lengths can't possibly fit on a
+    grid, because one is longer than the grid or the ships and the cells
+    around them would cover more than the board. Ships can't touch, so each
+    one with half a cell around it takes up a (length + 1) by 2 rectangle
+    of a grid one cell bigger. True only means the fleet might fit.
+    """
+
+    if any(length > grid_size for length in lengths):
+        return False
+    return sum(2 * (length + 1) for length in lengths) <= (grid_size + 1) ** 2
+
+
+class ShipModel:
+
+    __slots__ = ('name', 'length', 'horizontal', 'column', 'row', 'cells',
+                 'halo', 'hits', 'sunk')
+
+    def __init__(self, name, length):
+        """Gives the ship a name and a length.
+        The ship starts off the board with no hits.
+        """
+
+        self.name = name
+        self.length = length
+        self.horizontal = True
+
+        # the column and row of the ship's top left cell, the index of every
+        # cell the ship covers and of every cell right next to it. these are
+        # only set while the ship is on a board
+        self.column = None
+        self.row = None
+        self.cells = ()
+        self.halo = ()
+
+        self.hits = 0
+        self.sunk = False
+
+    def reset(self):
+        """Takes the ship off the board and clears its hits."""
+
+        self.horizontal = True
+        self.column = None
+        self.row = None
+        self.cells = ()
+        self.halo = ()
+        self.hits = 0
+        self.sunk = False
+
+    def is_placed(self):
+        """Returns True if the ship is on a board."""
+
+        return self.column is not None
+
+
+class BoardModel:
+
+    __slots__ = ('grid_size', 'size', 'ships', 'occupant', 'guessed',
+                 'neighbours', 'ships_placed', 'ships_sunk', 'cells_left',
+                 'hits', 'misses')
+
+    def __init__(self, grid_size=10):
+        """Sets up an empty square grid with no ships and no guesses.
+        Cells are stored in flat lists indexed by column * grid_size + row,
+        which is the same order as Board.tiles.
+        """
+
+        self.grid_size = grid_size
+        self.size = grid_size * grid_size
+        self.ships = []
+
+        self.occupant = [None] * self.size
+        self.guessed = bytearray(self.size)
+
+        # the indexes of the (up to 8) cells around each cell
+        self.neighbours = self.neighbour_table()
+
+        self.clear_counts()
+
+    def clear_counts(self):
+        """Zeroes the counts of the fleet and the guesses. They are kept up
+        to date as ships are placed and removed and guesses are made, so
+        they never have to be counted again.
+        """
+
+        self.ships_placed = 0
+        self.ships_sunk = 0
+
+        # the cells of the ships on the board that haven't been hit yet
+        self.cells_left = 0
+
+        # guesses made, not counting the cells marked around sunk ships
+        self.hits = 0
+        self.misses = 0
+
+    def neighbour_table(self):
+        """Returns a list with a tuple of the indexes of the cells around
+        each cell. The list is shared by every board of the same size, so it
+        must not be changed.
+        """
+
+        gs = self.grid_size
+        if gs not in neighbour_tables:
+            table = []
+            for c in range(gs):
+                for r in range(gs):
+                    table.append(cells_around(gs, c, r))
+            neighbour_tables[gs] = table
+        return neighbour_tables[gs]
+
+    def reset(self):
+        """Takes every ship off the board and clears every guess."""
+
+        self.occupant = [None] * self.size
+        self.guessed = bytearray(self.size)
+        self.clear_counts()
+
+        for ship in self.ships:
+            ship.reset()
+
+    def index(self, column, row):
+        """Returns the flat index of a cell."""
+
+        return column * self.grid_size + row
+
+    def in_bounds(self, column, row):
+        """Returns True if the column and row are on the board."""
+
+        return 0 <= column < self.grid_size and 0 <= row < self.grid_size
+
+    def add_ship(self, ship):
+        """Adds a ship to the board's fleet without placing it and returns it.
+        """
+
+        self.ships.append(ship)
+        return ship
+
+    def add_fleet(self, fleet=DEFAULT_FLEET):
+        """Adds a ShipModel for every (name, length) pair in a fleet spec."""
+
+        for name, length in fleet:
+            self.add_ship(ShipModel(name, length))
+
+    def ship_at(self, column, row):
+        """Returns the ship in a cell, or None if the cell is empty."""
+
+        return self.occupant[column * self.grid_size + row]
+
+    def adjacent_ships(self, column, row):
+        """Returns a list of the ships in a cell and the cells around it."""
+
+        i = column * self.grid_size + row
+        ships = []
+
+        for j in (i,) + self.neighbours[i]:
+            ship = self.occupant[j]
+            if ship is not None and ship not in ships:
+                ships.append(ship)
+
+        return ships
+
+    def halo(self, ship):
+        """Returns a list of the indexes of the cells a ship covers and every
+        cell around it.
+        """
+
+        return sorted(ship.cells + ship.halo)
+
+    def can_place(self, ship, column, row, horizontal):
+        """Checks whether a ship could go with its top left cell at a certain
+        column and row. Returns False if the ship would hang off the board,
+        overlap another ship, or be right next to another ship. The ship's own
+        cells are ignored so ships can be moved or rotated in place.
+        """
+
+        gs = self.grid_size
+        if column < 0 or row < 0 or column >= gs or row >= gs:
+            return False
+
+        if horizontal:
+            if column + ship.length > gs:
+                return False
+            step = gs
+        else:
+            if row + ship.length > gs:
+                return False
+            step = 1
+
+        occupant = self.occupant
+        neighbours = self.neighbours
+        i = column * gs + row
+
+        for _ in range(ship.length):
+            other = occupant[i]
+            if other is not None and other is not ship:
+                return False
+
+            for j in neighbours[i]:
+                other = occupant[j]
+                if other is not None and other is not ship:
+                    return False
+
+            i += step
+
+        return True
+
+    def legal_anchors(self, ship, horizontal):
+        """Returns a list of the (column, row) of every top left cell where
+        a ship could go with a certain orientation. The ship's own cells are
+        ignored.
+        """
+
+        length = ship.length
+        neighbours = self.neighbours
+
+        # mark every cell that is in or around another ship
+        blocked = bytearray(self.size)
+        for other in self.ships:
+            if other is not ship:
+                for i in other.cells:
+                    blocked[i] = 1
+                    for j in neighbours[i]:
+                        blocked[j] = 1
+
+        return self.anchors_in(blocked, length, horizontal)
+
+    def anchors_in(self, blocked, length, horizontal):
+        """Returns a list of the (column, row) of every top left cell where
+        a ship of a certain length and orientation fits between the cells
+        marked in blocked, a sequence with an item for every cell.
+        """
+
+        gs = self.grid_size
+
+        # walk each line backwards counting the free cells in a row, so a
+        # cell is an anchor if there are enough free cells from it onwards
+        anchors = []
+        step = gs if horizontal else 1
+        for line in range(gs):
+            if horizontal:
+                i = (gs - 1) * gs + line
+            else:
+                i = line * gs + gs - 1
+
+            free = 0
+            for _ in range(gs):
+                if blocked[i]:
+                    free = 0
+                else:
+                    free += 1
+                    if free >= length:
+                        anchors.append(divmod(i, gs))
+                i -= step
+
+        return anchors
+
+    def place_ship(self, ship, column, row, horizontal):
+        """Puts a ship on the board with its top left cell at a certain column
+        and row. Moves the ship if it was already on the board.
+        Raises ValueError if the position is not valid.
+        """
+
+        if not self.can_place(ship, column, row, horizontal):
+            raise ValueError(f'{ship.name} cannot go at column {column}, '
+                             f'row {row}')
+
+        if ship.cells:
+            self.remove_ship(ship)
+
+        step = self.grid_size if horizontal else 1
+        start = column * self.grid_size + row
+        cells = tuple(range(start, start + step * ship.length, step))
+
+        for i in cells:
+            self.occupant[i] = ship
+
+        ship.column = column
+        ship.row = row
+        ship.horizontal = horizontal
+        ship.cells = cells
+        ship.halo = self.cells_next_to(cells)
+
+        self.ships_placed += 1
+        self.cells_left += ship.length - ship.hits
+
+    def cells_next_to(self, cells):
+        """Returns a tuple of the indexes of the cells right next to a group
+        of cells that aren't in it.
+        """
+
+        around = set()
+        for i in cells:
+            around.update(self.neighbours[i])
+        around.difference_update(cells)
+
+        return tuple(around)
+
+    def remove_ship(self, ship):
+        """Takes a ship off the board. Does nothing if it isn't on the board.
+        """
+
+        if ship.cells:
+            self.ships_placed -= 1
+            self.cells_left -= ship.length - ship.hits
+
+        for i in ship.cells:
+            self.occupant[i] = None
+
+        ship.column = None
+        ship.row = None
+        ship.cells = ()
+        ship.halo = ()
+
+    def random_layout(self, rng=random):
+        """Places every ship in the fleet at a random valid position, with
+        try_layout. The board is cleared and tried again if it gives up,
+        up to LAYOUT_RESTARTS times.
+        Raises ValueError if the fleet is too big for the board, or no
+        layout was found. A fleet no layout was found for is remembered, and
+        fails straight away on every board of the same size after that.
+        """
+
+        lengths = [ship.length for ship in self.ships]
+        key = (self.grid_size, tuple(sorted(lengths)))
+        if not fleet_fits(self.grid_size, lengths) or key in misfit_fleets:
+            raise ValueError('the fleet does not fit on the board')
+
+        try:
+            for _ in range(LAYOUT_RESTARTS):
+                if self.try_layout(rng):
+                    return
+        except ValueError:
+            misfit_fleets.add(key)
+            raise
+        for ship in self.ships:
+            self.remove_ship(ship)
+        misfit_fleets.add(key)
+        raise ValueError('no layout was found for the fleet')
+
+    def try_layout(self, rng=random, backtracks=LAYOUT_BACKTRACKS):
+        """Tries to place every ship in the fleet at a random valid
+        position. Each ship is put at one of the positions still open to it,
+        chosen uniformly, and if a ship has nowhere left to go the ship
+        before it is moved instead. Returns False if that happened more than
+        backtracks times, and True once every ship is placed.
+        Raises ValueError if every possibility was tried, so the fleet cannot
+        fit at all.
+        """
+
+        for ship in self.ships:
+            self.remove_ship(ship)
+
+        ships = self.ships
+        random_number = rng.random
+
+        # how many of the placed ships each cell is in or next to. it is
+        # made the first time the positions open to a ship are listed and
+        # then kept up to date as ships are placed and taken off, so listing
+        # them again doesn't have to look at every ship
+        blocked = None
+
+        def place(ship, column, row, horizontal):
+            self.place_ship(ship, column, row, horizontal)
+            if blocked is not None:
+                for j in ship.cells + ship.halo:
+                    blocked[j] += 1
+
+        def remove(ship):
+            if blocked is not None:
+                for j in ship.cells + ship.halo:
+                    blocked[j] -= 1
+            self.remove_ship(ship)
+
+        def positions(ship):
+            nonlocal blocked
+            if blocked is None:
+                blocked = [0] * self.size
+                for other in ships:
+                    for j in other.cells + other.halo:
+                        blocked[j] += 1
+            return [(column, row, horizontal)
+                    for horizontal in (True, False)
+                    for column, row in self.anchors_in(
+                        blocked, ship.length, horizontal)]
+
+        # the positions each ship hasn't tried yet, as (column, row,
+        # horizontal), once they have been listed
+        options = [None] * len(ships)
+
+        # random positions are only tried until the first ship runs out of
+        # room. after that the board is crowded enough that they rarely fit
+        crowded = False
+
+        i = 0
+        while i < len(ships):
+            ship = ships[i]
+            if options[i] is None:
+                if not crowded:
+                    position = self.random_position(ship, random_number)
+                    if position != None:
+                        place(ship, *position)
+                        i += 1
+                        continue
+                options[i] = positions(ship)
+            remaining = options[i]
+
+            if remaining:
+                # take a random position out of the list
+                k = int(random_number() * len(remaining))
+                remaining[k], remaining[-1] = remaining[-1], remaining[k]
+                place(ship, *remaining.pop())
+                i += 1
+            else:
+                # go back and move the previous ship somewhere else
+                crowded = True
+                options[i] = None
+                i -= 1
+                if i < 0:
+                    raise ValueError('the fleet does not fit on the board')
+                ship = ships[i]
+                position = (ship.column, ship.row, ship.horizontal)
+                remove(ship)
+                if options[i] is None:
+                    # it was put at a random position, so list the others
+                    options[i] = positions(ship)
+                    options[i].remove(position)
+                backtracks -= 1
+                if backtracks < 0:
+                    return False
+
+        return True
+
+    def random_position(self, ship, random_number, tries=LAYOUT_TRIES):
+        """Tries a number of positions for a ship, each chosen uniformly
+        from the positions that fit on the board, and returns the (column,
+        row, horizontal) of the first one that is free, or None if none
+        were. random_number returns a float in [0, 1).
+        """
+
+        gs = self.grid_size
+        length = ship.length
+        if length > gs:
+            return None
+
+        # each orientation has the same number of positions, so either is
+        # as likely, and only the cells along the ship need to be in range
+        along = gs - length + 1
+        for _ in range(tries):
+            k = int(random_number() * 2 * along * gs)
+            horizontal = k < along * gs
+            if not horizontal:
+                k -= along * gs
+            a, b = divmod(k, gs)
+            if horizontal:
+                column, row = a, b
+            else:
+                column, row = b, a
+            if self.can_place(ship, column, row, horizontal):
+                return column, row, horizontal
+
+        return None
+
+    def guess(self, column, row):
+        """Guesses a cell. Returns the ship that was hit, or None if it is a
+        miss. When a ship is sunk every cell around it is marked as guessed,
+        since there can't be another ship right next to it.
+        Raises ValueError if the cell was already guessed.
+        """
+
+        i = column * self.grid_size + row
+        guessed = self.guessed
+        if guessed[i]:
+            raise ValueError(f'column {column}, row {row} was already guessed')
+        guessed[i] = 1
+
+        ship = self.occupant[i]
+        if ship is None:
+            self.misses += 1
+            return None
+
+        self.record_hit(ship)
+        if ship.sunk:
+            for j in ship.halo:
+                guessed[j] = 1
+
+        return ship
+
+    def record_hit(self, ship):
+        """Counts a hit on a ship, sinking it if it was its last cell."""
+
+        self.hits += 1
+        if ship.cells:
+            self.cells_left -= 1
+
+        ship.hits += 1
+        if ship.hits == ship.length:
+            ship.sunk = True
+            self.ships_sunk += 1
+
+    def ships_afloat(self):
+        """Returns how many ships in the fleet haven't been sunk."""
+
+        return len(self.ships) - self.ships_sunk
+
+    def all_placed(self):
+        """Returns True if every ship in the fleet is on the board."""
+
+        return self.ships_placed == len(self.ships)
+
+    def all_sunk(self):
+        """Returns True if every ship in the fleet has been sunk."""
+
+        return self.ships_sunk == len(self.ships)
+
+
+class RandomShooter:
+
+    def __init__(self, grid_size=10, rng=random):
+        """Shuffles every cell of the grid into a firing order."""
+
+        # sorting on random keys is a uniform shuffle, and much cheaper than
+        # random.shuffle since it only calls rng.random
+        random_key = rng.random
+        self.order = sorted(range(grid_size * grid_size),
+                            key=lambda _: random_key())
+        self.grid_size = grid_size
+
+    def choose(self, board):
+        """Returns the column and row of the next cell that hasn't been
+        guessed.
+        """
+
+        guessed = board.guessed
+        order = self.order
+        i = order.pop()
+        while guessed[i]:
+            i = order.pop()
+
+        return divmod(i, self.grid_size)
+
+    def observe(self, column, row, ship):
+        """Is told the result of each guess. A random shooter ignores it."""
+
+        pass
+
+
+def play_game(board, shooter):
+    """Lets a shooter guess on a board until every ship is sunk.
+    Returns the number of shots it took.
+    """
+
+    remaining = 0
+    for ship in board.ships:
+        remaining += ship.length - ship.hits
+
+    choose = shooter.choose
+    observe = shooter.observe
+    guess = board.guess
+
+    shots = 0
+    while remaining > 0:
+        column, row = choose(board)
+        ship = guess(column, row)
+        observe(column, row, ship)
+        shots += 1
+        if ship is not None:
+            remaining -= 1
+
+    return shots
+
+
+def simulate(games, make_shooter=RandomShooter, grid_size=10,
+             fleet=DEFAULT_FLEET, seed=None, board_class=BoardModel):
+    """Plays a number of games without a display, each with a fresh random
+    layout. make_shooter is called with the grid size and a random number
+    generator. board_class can be any BoardModel subclass, such as
+    bitboard.BitBoardModel. Returns a list of how many shots each game took.
+    """
+
+    rng = random.Random(seed)
+    board = board_class(grid_size)
+    board.add_fleet(fleet)
+
+    results = []
+    for _ in range(games):
+        board.reset()
+        board.random_layout(rng)
+        results.append(play_game(board, make_shooter(grid_size, rng)))
+
+    return results
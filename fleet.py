@@ -0,0 +1,58 @@
+import random
+
+from bitboard import BitBoardModel
+from engine import DEFAULT_FLEET, ShipModel
+from sparse import SparseBoardModel
+
+# the widest grid that is kept in bitmasks. bigger grids are mostly empty, so
+# a SparseBoardModel is used for them instead
+BITBOARD_LIMIT = 32
+
+
+def board_model(grid_size):
+    """Returns an empty board model of the best kind for a grid size."""
+
+    if grid_size <= BITBOARD_LIMIT:
+        return BitBoardModel(grid_size)
+    return SparseBoardModel(grid_size)
+
+
+def random_layouts(count, grid_size=10, fleet=DEFAULT_FLEET, seed=None):
+    """Returns a list of count independent random fleet layouts. Each layout
+    is a tuple with a (column, row, horizontal) for every ship in the fleet
+    spec, in the same order. The same seed always gives the same layouts.
+    Raises ValueError if the fleet cannot fit on the board.
+    """
+
+    rng = random.Random(seed)
+    board = board_model(grid_size)
+    for name, length in fleet:
+        board.add_ship(ShipModel(name, length))
+
+    layouts = []
+    for _ in range(count):
+        board.random_layout(rng)
+        layouts.append(tuple((ship.column, ship.row, ship.horizontal)
+                             for ship in board.ships))
+
+    return layouts
+
+
+def apply_layout(board, layout):
+    """Places the ships of a BoardModel according to a layout from
+    random_layouts. Any ships already on the board are taken off first.
+    """
+
+    for ship in board.ships:
+        board.remove_ship(ship)
+
+    for ship, (column, row, horizontal) in zip(board.ships, layout):
+        board.place_ship(ship, column, row, horizontal)
+
+
+def repeat_fleet(copies, fleet=DEFAULT_FLEET):
+    """Returns a fleet spec with a number of copies of every ship in a fleet,
+    for bigger boards.
+    """
+
+    return tuple(fleet) * copies
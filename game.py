@@ -0,0 +1,273 @@
+import argparse
+import random
+import sys
+import tracemalloc
+from array import array
+
+import fleet
+from ai import DensityTargeter, MonteCarloTargeter
+from engine import DEFAULT_FLEET, ShipModel
+
+# what each of the computer's guesses found, kept in the lowest two bits of
+# its record of the guess
+MISS = 0
+HIT = 1
+SUNK = 2
+
+# stands in for the ship hit by a guess that didn't sink it when the computer
+# is shown its guesses again. the targeters only look at which ship was hit
+# once it is sunk
+hit_ship = ShipModel('ship', 0)
+
+
+class ComputerPlayer:
+
+    __slots__ = ('kind', 'seed', 'grid_size', 'fleet_lengths', 'time_limit',
+                 'guesses', 'targeter')
+
+    def __init__(self, kind, seed, grid_size=10, fleet_lengths=(5, 4, 3, 3,
+                                                                2),
+                 time_limit=None):
+        """Sets up a computer opponent of a kind from savegame.COMPUTERS that
+        makes its random choices from a seed. time_limit is the most seconds
+        it spends on a guess, or None for its targeter's own limit.
+        Every guess it makes is kept in a compact record, so its targeter
+        can be thrown away between turns with release and made again from
+        the record when it is next needed.
+        """
+
+        self.kind = kind
+        self.seed = seed
+        self.grid_size = grid_size
+        self.fleet_lengths = tuple(fleet_lengths)
+        self.time_limit = time_limit
+
+        # the index of each cell guessed, shifted up two bits, with what the
+        # guess found in the bottom two
+        self.guesses = array('I')
+
+        # made the first time it is needed
+        self.targeter = None
+
+    def make_targeter(self):
+        """Returns a new targeter of the computer's kind."""
+
+        rng = random.Random(self.seed)
+        if self.kind == 'montecarlo':
+            targeter = MonteCarloTargeter
+        else:
+            targeter = DensityTargeter
+
+        if self.time_limit == None:
+            return targeter(self.grid_size, self.fleet_lengths, rng)
+        return targeter(self.grid_size, self.fleet_lengths, rng,
+                        self.time_limit)
+
+    def rebuild(self, board):
+        """Makes the targeter again and shows it every guess so far, which
+        brings back what it knew about the board.
+        """
+
+        targeter = self.make_targeter()
+        gs = self.grid_size
+
+        for guess in self.guesses:
+            column, row = divmod(guess >> 2, gs)
+            result = guess & 3
+            ship = None
+            if result == SUNK:
+                ship = board.ship_at(column, row)
+            elif result == HIT:
+                ship = hit_ship
+            targeter.observe(column, row, ship)
+
+        self.targeter = targeter
+
+    def release(self):
+        """Throws the targeter away to save memory. Only call this between
+        the computer's turns, since a targeter that thinks in the background
+        loses what it was working on.
+        """
+
+        self.targeter = None
+
+    def poll(self, board):
+        """Returns the column and row of the computer's next guess on a
+        BoardModel, or None if it hasn't decided yet.
+        """
+
+        if self.targeter == None:
+            self.rebuild(board)
+        return self.targeter.poll(board)
+
+    def choose(self, board):
+        """Returns the column and row of the computer's next guess on a
+        BoardModel, waiting until it has decided.
+        """
+
+        if self.targeter == None:
+            self.rebuild(board)
+        return self.targeter.choose(board)
+
+    def observe(self, column, row, ship):
+        """Records what one of the computer's guesses found. ship is the ship
+        that was hit, or None for a miss.
+        """
+
+        if ship == None:
+            result = MISS
+        elif ship.sunk:
+            result = SUNK
+        else:
+            result = HIT
+        self.guesses.append((column * self.grid_size + row) << 2 | result)
+
+        if self.targeter != None:
+            self.targeter.observe(column, row, ship)
+
+
+class Game:
+
+    __slots__ = ('boards', 'computer', 'state', 'first_turn', 'tile_clicked',
+                 'turn_length', 'pending_turn', 'awaiting_result')
+
+    def __init__(self, boards, computer=None):
+        """Holds the state of one game: the player's board and the
+        opponent's board (Boards or BoardModels), the computer opponent or
+        anything else with poll and observe, and whose turn it is.
+        """
+
+        self.boards = boards
+        self.computer = computer
+        self.reset()
+
+    def reset(self):
+        """Goes back to setting up the player's ships."""
+
+        self.state = 'setup'
+        self.first_turn = True
+        self.tile_clicked = False
+
+        # how many turn lengths to wait before the next turn starts
+        self.turn_length = 1
+
+        # the (state, message) the game moves on to once the current turn
+        # has finished
+        self.pending_turn = None
+
+        # set while waiting for a server to say what the player's guess hit
+        self.awaiting_result = False
+
+    def winner(self):
+        """Returns 0 if the player has sunk every ship, 1 if the opponent
+        has, or None if neither has.
+        """
+
+        if self.boards[1].all_sunk():
+            return 0
+        if self.boards[0].all_sunk():
+            return 1
+        return None
+
+
+def new_game(grid_size=10, fleet_spec=DEFAULT_FLEET, kind='density',
+             rng=random):
+    """Returns a Game on BoardModels with both fleets placed at random,
+    against a computer of a kind, ready for the player's first turn.
+    """
+
+    boards = []
+    for _ in range(2):
+        board = fleet.board_model(grid_size)
+        for name, length in fleet_spec:
+            board.add_ship(ShipModel(name, length))
+        board.random_layout(rng)
+        boards.append(board)
+
+    computer = ComputerPlayer(kind, rng.getrandbits(32), grid_size,
+                              [length for _, length in fleet_spec])
+    game = Game(boards, computer)
+    game.state = 'player turn'
+    return game
+
+
+def play_turns(game, turns, rng=random):
+    """Plays up to a number of turns of a Game on BoardModels, with the
+    player guessing at random and the computer answering each guess.
+    Returns the number of turns played, which is fewer if someone won.
+    """
+
+    player_board, opponent_board = game.boards
+    size = opponent_board.size
+
+    for turn in range(turns):
+        if game.state == 'game over':
+            return turn
+
+        i = rng.randrange(size)
+        while opponent_board.guessed[i]:
+            i = rng.randrange(size)
+        opponent_board.guess(*divmod(i, opponent_board.grid_size))
+
+        if game.winner() == None:
+            column, row = game.computer.choose(player_board)
+            game.computer.observe(column, row,
+                                  player_board.guess(column, row))
+
+        if game.winner() != None:
+            game.state = 'game over'
+
+    return turns
+
+
+def measure(count, grid_size=10, turns=20, release=True, seed=0):
+    """Makes a number of games, plays some turns of each and returns the
+    number of bytes each one holds on to. Tables shared by every game of the
+    same size are not counted. If release is True the computers' targeters
+    are thrown away after their last turn, as a server could for games
+    waiting on a player.
+    """
+
+    rng = random.Random(seed)
+    fleet_spec = fleet.repeat_fleet(max(1, grid_size // 10))
+
+    # make the shared tables before measuring
+    play_turns(new_game(grid_size, fleet_spec, rng=rng), turns, rng)
+
+    games = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(count):
+        game = new_game(grid_size, fleet_spec, rng=rng)
+        play_turns(game, turns, rng)
+        if release:
+            game.computer.release()
+        games.append(game)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    return used / count
+
+
+def main(argv=None):
+    """Measures how much memory games take from the command line."""
+
+    parser = argparse.ArgumentParser(
+        description='Measure how much memory each live game takes.')
+    parser.add_argument('games', type=int, nargs='?', default=1000,
+                        help='games to hold at once (default 1000)')
+    parser.add_argument('--grid', type=int, default=10)
+    parser.add_argument('--turns', type=int, default=20,
+                        help='turns to play in each game before measuring'
+                             ' (default 20)')
+    args = parser.parse_args(argv)
+
+    for release in (False, True):
+        size = measure(args.games, args.grid, args.turns, release)
+        label = 'released' if release else 'kept'
+        print(f'targeters {label}: {size / 1024:.1f} KiB per game,'
+              f' {100000 * size / 2 ** 20:.0f} MiB per 100000 games')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
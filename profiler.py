@@ -0,0 +1,207 @@
+import collections
+import csv
+import json
+import time
+
+import pygame
+
+import assets
+from stats import percentile
+
+# the parts of each frame of the main loop, in order
+PHASES = ('events', 'update', 'game flow', 'render', 'tick')
+
+
+class FrameProfiler:
+
+    def __init__(self, window=300, record=False, refresh=0.5,
+                 clock=time.perf_counter):
+        """Sets up rolling timings of the last window frames, split into the
+        phases of the main loop. Every frame is also kept for export if
+        record=True. The overlay is redrawn every refresh seconds while it
+        is shown.
+        """
+
+        self.clock = clock
+        self.window = window
+        self.refresh = refresh
+
+        # the last window frame times, and the last window times of each
+        # phase, in seconds
+        self.frames = collections.deque(maxlen=window)
+        self.phases = {phase: collections.deque(maxlen=window)
+                       for phase in PHASES}
+        self.trace = [] if record else None
+        self.count = 0
+
+        self.frame_start = None
+        self.last_mark = None
+        self.current = {}
+
+        # the overlay, and when and where it was last drawn
+        self.show = False
+        self.surface = None
+        self.rendered_at = None
+        self.rect = pygame.Rect(8, 8, 0, 0)
+        self.drawn_rect = None
+
+    def start_frame(self):
+        """Starts timing a frame."""
+
+        self.frame_start = self.last_mark = self.clock()
+        self.current = {}
+
+    def mark(self, phase):
+        """Ends a phase of the frame. Its time is everything since the last
+        phase ended or the frame started.
+        """
+
+        now = self.clock()
+        self.current[phase] = (self.current.get(phase, 0)
+                               + now - self.last_mark)
+        self.last_mark = now
+
+    def end_frame(self):
+        """Adds the frame and each of its phases to the rolling timings."""
+
+        total = self.last_mark - self.frame_start
+        self.frames.append(total)
+        for phase, seconds in self.current.items():
+            if phase not in self.phases:
+                self.phases[phase] = collections.deque(maxlen=self.window)
+            self.phases[phase].append(seconds)
+
+        if self.trace != None:
+            row = {'frame': self.count, 'total': total}
+            row.update(self.current)
+            self.trace.append(row)
+        self.count += 1
+
+    def stats(self):
+        """Returns a dictionary of the mean, p50, p95, p99 and max time in
+        milliseconds of the frame and of each phase, over the rolling window.
+        """
+
+        stats = {}
+        for name, samples in [('frame', self.frames)] + list(
+                self.phases.items()):
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            stats[name] = {
+                'mean': 1000 * sum(ordered) / len(ordered),
+                'p50': 1000 * percentile(ordered, 50),
+                'p95': 1000 * percentile(ordered, 95),
+                'p99': 1000 * percentile(ordered, 99),
+                'max': 1000 * ordered[-1],
+            }
+        return stats
+
+    def histogram(self, bucket=0.002, buckets=16):
+        """Returns a list of how many frames in the rolling window took each
+        bucket seconds long range of time. The last bucket also counts every
+        longer frame.
+        """
+
+        counts = [0] * buckets
+        for seconds in self.frames:
+            counts[min(buckets - 1, int(seconds / bucket))] += 1
+        return counts
+
+    def export(self, path):
+        """Writes every recorded frame to a CSV file if the path ends with
+        .csv, and otherwise writes the frames with the rolling stats and
+        histogram to a JSON file.
+        """
+
+        frames = self.trace if self.trace != None else []
+
+        if path.endswith('.csv'):
+            columns = ['frame', 'total'] + list(self.phases)
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, columns)
+                writer.writeheader()
+                writer.writerows(frames)
+        else:
+            with open(path, 'w') as f:
+                json.dump({'stats_ms': self.stats(),
+                           'histogram': {'bucket_ms': 2,
+                                         'counts': self.histogram()},
+                           'frames': frames}, f)
+
+    def toggle(self):
+        """Shows the overlay if it is hidden and hides it if it is shown."""
+
+        self.show = not self.show
+        self.rendered_at = None
+
+    def changed_rects(self):
+        """Returns a list of the parts of the screen that need to be redrawn
+        because the overlay was shown, hidden or refreshed since the last time
+        this was called.
+        """
+
+        rects = []
+        if self.show:
+            now = self.clock()
+            if (self.rendered_at == None
+                    or now - self.rendered_at >= self.refresh):
+                self.rendered_at = now
+                self.surface = self.render_overlay()
+                self.rect.size = self.surface.get_size()
+                if self.drawn_rect != None:
+                    rects.append(self.drawn_rect)
+                self.drawn_rect = self.rect.copy()
+                rects.append(self.drawn_rect)
+        elif self.drawn_rect != None:
+            rects.append(self.drawn_rect)
+            self.drawn_rect = None
+
+        return rects
+
+    def render_overlay(self):
+        """Returns a Surface with the frame and phase timings and a histogram
+        of frame times on it.
+        """
+
+        font = assets.font(14)
+        line_height = font.get_linesize()
+        stats = self.stats()
+
+        lines = ['ms        p50    p95    p99']
+        for name in ('frame',) + PHASES:
+            if name in stats:
+                s = stats[name]
+                lines.append(f"{name:<9} {s['p50']:>6.2f} {s['p95']:>6.2f} "
+                             f"{s['p99']:>6.2f}")
+
+        counts = self.histogram()
+        bar_width = 12
+        chart_height = 40
+        width = max(len(counts) * bar_width, max(font.size(line)[0]
+                                                 for line in lines)) + 8
+        height = len(lines) * line_height + chart_height + 12
+
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 190))
+
+        for y, line in enumerate(lines):
+            surface.blit(font.render(line, True, 'white'),
+                         (4, 4 + y * line_height))
+
+        # one bar per 2 ms of frame time, scaled to the busiest bar
+        top = len(lines) * line_height + 8
+        most = max(counts) or 1
+        for n, count in enumerate(counts):
+            bar = chart_height * count // most
+            pygame.draw.rect(surface, (120, 220, 120),
+                             (4 + n * bar_width, top + chart_height - bar,
+                              bar_width - 2, bar))
+
+        return surface
+
+    def draw(self, surf):
+        """Displays the overlay if it is shown."""
+
+        if self.show and self.surface != None:
+            surf.blit(self.surface, self.rect)
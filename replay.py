@@ -0,0 +1,633 @@
+import bisect
+import os
+import random
+import struct
+
+import fleet
+from engine import DEFAULT_FLEET, RandomShooter, ShipModel
+
+# a replay log starts with these bytes and a format version
+MAGIC = b'BSRP'
+VERSION = 2
+
+# every record starts with one of these tags. guesses take one tag per side
+# so most of them fit in two or three bytes
+GAME = 0
+PLACE = 1
+REMOVE = 2
+GUESS = 3
+SNAPSHOT = 5
+INDEX = 6
+TRAILER = 7
+
+# a trailer is its tag, the offset of the index before it and these bytes.
+# a log that doesn't end with one was not closed properly
+TRAILER_MAGIC = b'BSRI'
+TRAILER_SIZE = 13
+
+SIDES = 2
+
+
+def write_varint(out, n):
+    """Appends a non-negative integer to a bytearray, 7 bits per byte."""
+
+    while n >= 0x80:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data, pos):
+    """Returns an integer written by write_varint and the position after it.
+    Raises IndexError if the data ends part way through.
+    """
+
+    b = data[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+
+    n = b & 0x7f
+    shift = 7
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+class ReplayGame:
+
+    def __init__(self, offset):
+        """Keeps track of where a game is in a log, how many guesses it has
+        and where each of its snapshots is.
+        """
+
+        self.offset = offset
+        self.length = 0
+        self.turns = 0
+
+        # the turn and offset of each snapshot, in order
+        self.snapshot_turns = []
+        self.snapshot_offsets = []
+
+
+def read_record(data, pos):
+    """Returns the tag of the record at a position, its contents and the
+    position after it. Raises IndexError or ValueError if the record is cut
+    off or not a record.
+    """
+
+    tag = data[pos]
+    pos += 1
+
+    if tag == GAME:
+        grid_size, pos = read_varint(data, pos)
+        count, pos = read_varint(data, pos)
+        ships = []
+        for _ in range(count):
+            length, pos = read_varint(data, pos)
+            size, pos = read_varint(data, pos)
+            if pos + size > len(data):
+                raise IndexError('record is cut off')
+            ships.append((bytes(data[pos:pos + size]).decode(), length))
+            pos += size
+        return tag, (grid_size, tuple(ships)), pos
+
+    if tag == PLACE:
+        side = data[pos]
+        n, pos = read_varint(data, pos + 1)
+        column, pos = read_varint(data, pos)
+        row, pos = read_varint(data, pos)
+        return tag, (side, n >> 1, column, row, n & 1 == 1), pos
+
+    if tag == REMOVE:
+        side = data[pos]
+        n, pos = read_varint(data, pos + 1)
+        return tag, (side, n), pos
+
+    if GUESS <= tag < GUESS + SIDES:
+        i, pos = read_varint(data, pos)
+        return tag, (tag - GUESS, i), pos
+
+    if tag == SNAPSHOT:
+        turn, pos = read_varint(data, pos)
+        sides, pos = read_varint(data, pos)
+        boards = []
+        for _ in range(sides):
+            count, pos = read_varint(data, pos)
+            positions = []
+            for _ in range(count):
+                n, pos = read_varint(data, pos)
+                positions.append(n)
+            count, pos = read_varint(data, pos)
+            shots = []
+            for _ in range(count):
+                i, pos = read_varint(data, pos)
+                shots.append(i)
+            boards.append((positions, shots))
+        return tag, (turn, boards), pos
+
+    if tag == INDEX:
+        previous, pos = read_varint(data, pos)
+        count, pos = read_varint(data, pos)
+        games = []
+        offset = 0
+        for _ in range(count):
+            gap, pos = read_varint(data, pos)
+            offset += gap
+            game = ReplayGame(offset)
+            game.length, pos = read_varint(data, pos)
+            game.turns, pos = read_varint(data, pos)
+            snapshots, pos = read_varint(data, pos)
+            for _ in range(snapshots):
+                turn, pos = read_varint(data, pos)
+                gap, pos = read_varint(data, pos)
+                game.snapshot_turns.append(turn)
+                game.snapshot_offsets.append(offset + gap)
+            games.append(game)
+        return tag, (previous, games), pos
+
+    if tag == TRAILER:
+        if pos + TRAILER_SIZE - 1 > len(data):
+            raise IndexError('record is cut off')
+        offset, magic = struct.unpack_from('<Q4s', data, pos)
+        if magic != TRAILER_MAGIC:
+            raise ValueError('not a trailer')
+        return tag, offset, pos + TRAILER_SIZE - 1
+
+    raise ValueError(f'unknown record tag {tag}')
+
+
+def read_record_at(f, offset):
+    """Returns the tag and contents of the record at an offset in an open
+    file, reading only as much of the file as the record needs.
+    """
+
+    size = 4096
+    while True:
+        f.seek(offset)
+        data = f.read(size)
+        try:
+            tag, value, _ = read_record(data, 0)
+            return tag, value
+        except IndexError:
+            if len(data) < size:
+                raise
+            size *= 4
+
+
+def scan(data, pos=len(MAGIC) + 1):
+    """Reads every record from a position onwards and returns a list of the
+    games found and the offset where the last whole record ends. Stops at
+    the first record that is cut off, which is where a log that wasn't
+    closed properly ends.
+    """
+
+    games = []
+    game = None
+    end = pos
+
+    while pos < len(data):
+        try:
+            tag, value, next_pos = read_record(data, pos)
+        except (IndexError, ValueError):
+            break
+
+        if tag == GAME or tag == INDEX or tag == TRAILER:
+            if game != None:
+                game.length = pos - game.offset
+                game = None
+            if tag == GAME:
+                game = ReplayGame(pos)
+                games.append(game)
+        elif game != None:
+            if tag == SNAPSHOT:
+                game.snapshot_turns.append(value[0])
+                game.snapshot_offsets.append(pos)
+            elif tag >= GUESS and tag < GUESS + SIDES:
+                game.turns += 1
+
+        pos = end = next_pos
+
+    if game != None:
+        game.length = end - game.offset
+
+    return games, end
+
+
+def load_index(f):
+    """Returns a list of every game in an open log file, the offset of its
+    last index, or 0 if it has none, and the offset where its last whole
+    record ends.
+    Uses the indexes written when the log was closed, and reads through the
+    whole log if it wasn't.
+    Raises ValueError if the file isn't a replay log or its indexes are
+    damaged.
+    """
+
+    f.seek(0)
+    header = f.read(len(MAGIC) + 1)
+    if header[:len(MAGIC)] != MAGIC:
+        raise ValueError('not a replay log')
+    if len(header) <= len(MAGIC):
+        raise ValueError('replay log is cut off')
+    if header[len(MAGIC)] != VERSION:
+        raise ValueError(f'unsupported replay log version {header[-1]}')
+
+    size = f.seek(0, os.SEEK_END)
+    if size >= len(header) + TRAILER_SIZE:
+        f.seek(size - TRAILER_SIZE)
+        try:
+            tag, last_index, _ = read_record(f.read(TRAILER_SIZE), 0)
+        except (IndexError, ValueError):
+            tag = None
+
+        if tag == TRAILER:
+            # each index covers the games written since the one before it
+            sessions = []
+            offset = last_index
+            end = size - TRAILER_SIZE
+            while offset:
+                # every index comes before the ones written after it and
+                # after the games it covers, so a damaged offset can't send
+                # this round in circles or out of the file
+                if not len(header) <= offset < end:
+                    raise ValueError('replay log index is damaged')
+                try:
+                    tag, value = read_record_at(f, offset)
+                except (IndexError, ValueError):
+                    raise ValueError('replay log index is damaged')
+                if tag != INDEX:
+                    raise ValueError('replay log index is damaged')
+
+                previous, games = value
+                for game in games:
+                    if (game.offset < len(header)
+                            or game.offset + game.length > offset
+                            or any(not game.offset <= snapshot < offset
+                                   for snapshot in game.snapshot_offsets)):
+                        raise ValueError('replay log index is damaged')
+                sessions.append(games)
+                end = offset
+                offset = previous
+
+            games = []
+            for session in reversed(sessions):
+                games += session
+            return games, last_index, size
+
+    f.seek(0)
+    games, end = scan(f.read())
+    return games, 0, end
+
+
+class ReplayWriter:
+
+    def __init__(self, path, snapshot_every=32):
+        """Opens a replay log to add games to, making it if it doesn't
+        exist. A log that wasn't closed properly is cut back to its last
+        whole record first.
+        A snapshot of both boards is written at most every snapshot_every
+        guesses.
+        """
+
+        self.snapshot_every = snapshot_every
+
+        # the games written since the file was opened, and the last index
+        # written before that
+        self.games = []
+        self.previous_index = 0
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.file = open(path, 'r+b')
+            games, self.previous_index, end = load_index(self.file)
+            if not self.previous_index:
+                # nothing indexes these games yet, so this index will
+                self.games = games
+            self.file.truncate(end)
+            self.file.seek(end)
+            self.offset = end
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC + bytes([VERSION]))
+            self.offset = len(MAGIC) + 1
+
+        # records that haven't been written to the file yet
+        self.buffer = bytearray()
+        self.game = None
+
+    def start_game(self, grid_size, fleet_spec=DEFAULT_FLEET):
+        """Starts recording a new game on a pair of empty boards with a
+        certain grid size and fleet of (name, length) pairs.
+        """
+
+        self.end_game()
+
+        self.game = ReplayGame(self.offset + len(self.buffer))
+        self.games.append(self.game)
+        self.grid_size = grid_size
+
+        # the (column, row, horizontal) of each ship and the cells guessed
+        # on each side, for snapshots
+        self.positions = [[None] * len(fleet_spec) for _ in range(SIDES)]
+        self.shots = [[] for _ in range(SIDES)]
+
+        # snapshots are spaced out so they never take up more room than the
+        # moves between them
+        self.since_snapshot = 0
+        self.snapshot_size = 0
+
+        out = self.buffer
+        out.append(GAME)
+        write_varint(out, grid_size)
+        write_varint(out, len(fleet_spec))
+        for name, length in fleet_spec:
+            name = name.encode()
+            write_varint(out, length)
+            write_varint(out, len(name))
+            out += name
+
+    def end_game(self):
+        """Finishes the game being recorded and writes it to the file."""
+
+        if self.game != None:
+            self.game.length = (self.offset + len(self.buffer)
+                                - self.game.offset)
+            self.game = None
+            self.flush()
+
+    def place(self, side, n, column, row, horizontal):
+        """Records the nth ship of a side being put on its board, or moved,
+        with its top left cell at a column and row.
+        """
+
+        out = self.buffer
+        out.append(PLACE)
+        out.append(side)
+        write_varint(out, n * 2 + horizontal)
+        write_varint(out, column)
+        write_varint(out, row)
+        self.positions[side][n] = (column, row, horizontal)
+
+    def place_all(self, side, board):
+        """Records every ship that is on a BoardModel being placed."""
+
+        for n, ship in enumerate(board.ships):
+            if ship.is_placed():
+                self.place(side, n, ship.column, ship.row, ship.horizontal)
+
+    def remove(self, side, n):
+        """Records the nth ship of a side being taken off its board."""
+
+        out = self.buffer
+        out.append(REMOVE)
+        out.append(side)
+        write_varint(out, n)
+        self.positions[side][n] = None
+
+    def guess(self, side, column, row):
+        """Records a guess on a side's board, and takes a snapshot if it is
+        time for one.
+        """
+
+        i = column * self.grid_size + row
+        out = self.buffer
+        start = len(out)
+        out.append(GUESS + side)
+        write_varint(out, i)
+
+        self.shots[side].append(i)
+        self.game.turns += 1
+        self.since_snapshot += len(out) - start
+
+        if (self.game.turns % self.snapshot_every == 0
+                and self.since_snapshot >= self.snapshot_size):
+            self.snapshot()
+
+        if len(out) >= 65536:
+            self.flush()
+
+    def snapshot(self):
+        """Records where every ship is and every cell guessed on both sides,
+        so a reader can start from here instead of the start of the game.
+        """
+
+        out = self.buffer
+        start = len(out)
+        self.game.snapshot_turns.append(self.game.turns)
+        self.game.snapshot_offsets.append(self.offset + start)
+
+        out.append(SNAPSHOT)
+        write_varint(out, self.game.turns)
+        write_varint(out, SIDES)
+        gs = self.grid_size
+        for side in range(SIDES):
+            positions = self.positions[side]
+            write_varint(out, len(positions))
+            for position in positions:
+                if position == None:
+                    write_varint(out, 0)
+                else:
+                    column, row, horizontal = position
+                    write_varint(out, (column * gs + row) * 2 + horizontal + 1)
+
+            # in the order they were made, so guessing them again gives the
+            # same hits and misses
+            shots = self.shots[side]
+            write_varint(out, len(shots))
+            for i in shots:
+                write_varint(out, i)
+
+        self.snapshot_size = len(out) - start
+        self.since_snapshot = 0
+
+    def flush(self):
+        """Writes any buffered records to the file."""
+
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.offset += len(self.buffer)
+            self.buffer = bytearray()
+        self.file.flush()
+
+    def close(self):
+        """Finishes the current game, writes an index of the games and where
+        their snapshots are, and closes the file.
+        """
+
+        self.end_game()
+
+        index = self.offset
+        out = self.buffer
+        out.append(INDEX)
+        write_varint(out, self.previous_index)
+        write_varint(out, len(self.games))
+        last = 0
+        for game in self.games:
+            write_varint(out, game.offset - last)
+            write_varint(out, game.length)
+            write_varint(out, game.turns)
+            write_varint(out, len(game.snapshot_turns))
+            for turn, offset in zip(game.snapshot_turns,
+                                    game.snapshot_offsets):
+                write_varint(out, turn)
+                write_varint(out, offset - game.offset)
+            last = game.offset
+
+        out.append(TRAILER)
+        out += struct.pack('<Q4s', index, TRAILER_MAGIC)
+
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayReader:
+
+    def __init__(self, path, board_model=fleet.board_model):
+        """Opens a replay log and reads its index. board_model is called with
+        a grid size to make the boards games are rebuilt on.
+        """
+
+        self.path = path
+        self.board_model = board_model
+        with open(path, 'rb') as f:
+            self.games, _, _ = load_index(f)
+
+    def read_game(self, number):
+        """Returns the bytes of a game's records."""
+
+        game = self.games[number]
+        with open(self.path, 'rb') as f:
+            f.seek(game.offset)
+            return f.read(game.length)
+
+    def moves(self, number):
+        """Yields every placement, removal and guess in a game, in order, as
+        ('place', side, n, column, row, horizontal), ('remove', side, n) or
+        ('guess', side, column, row).
+        """
+
+        data = self.read_game(number)
+        _, (grid_size, _), pos = read_record(data, 0)
+
+        while pos < len(data):
+            tag, value, pos = read_record(data, pos)
+            if tag == PLACE:
+                yield ('place',) + value
+            elif tag == REMOVE:
+                yield ('remove',) + value
+            elif tag != SNAPSHOT:
+                side, i = value
+                yield ('guess', side) + divmod(i, grid_size)
+
+    def state_at(self, number, turn):
+        """Returns a list of both sides' BoardModels as they were after a
+        number of guesses in a game, with every ship placed since then.
+        Starts from the last snapshot before that turn, so only the moves
+        after it are replayed.
+        Raises IndexError if the game doesn't have that many turns.
+        """
+
+        game = self.games[number]
+        if not 0 <= turn <= game.turns:
+            raise IndexError(f'game {number} has {game.turns} turns')
+
+        data = self.read_game(number)
+        _, (grid_size, fleet_spec), pos = read_record(data, 0)
+
+        boards = []
+        for _ in range(SIDES):
+            board = self.board_model(grid_size)
+            for name, length in fleet_spec:
+                board.add_ship(ShipModel(name, length))
+            boards.append(board)
+
+        current = 0
+        k = bisect.bisect_right(game.snapshot_turns, turn) - 1
+        if k >= 0:
+            tag, (current, sides), pos = read_record(
+                data, game.snapshot_offsets[k] - game.offset)
+            for board, (positions, shots) in zip(boards, sides):
+                restore(board, positions, shots)
+
+        while pos < len(data):
+            tag, value, next_pos = read_record(data, pos)
+            if tag == PLACE:
+                side, n, column, row, horizontal = value
+                board = boards[side]
+                board.place_ship(board.ships[n], column, row, horizontal)
+            elif tag == REMOVE:
+                side, n = value
+                boards[side].remove_ship(boards[side].ships[n])
+            elif tag != SNAPSHOT:
+                if current == turn:
+                    break
+                side, i = value
+                boards[side].guess(*divmod(i, grid_size))
+                current += 1
+            pos = next_pos
+
+        return boards
+
+
+def restore(board, positions, shots):
+    """Puts a BoardModel into the state stored for one side in a snapshot.
+    """
+
+    board.reset()
+    gs = board.grid_size
+    for ship, n in zip(board.ships, positions):
+        if n:
+            column, row = divmod((n - 1) >> 1, gs)
+            board.place_ship(ship, column, row, (n - 1) & 1 == 1)
+
+    # the shots are guessed again in the order they were made, so a miss
+    # next to a ship is counted before the ship sinks and marks it
+    for i in shots:
+        board.guess(*divmod(i, gs))
+
+
+def record_games(path, games, make_shooter=RandomShooter, grid_size=10,
+                 fleet_spec=DEFAULT_FLEET, seed=None, snapshot_every=32):
+    """Plays a number of games without a display like engine.simulate and
+    adds them to a replay log. Each game is a shooter guessing on side 0
+    until every ship is sunk. Returns a list of how many shots each game
+    took.
+    """
+
+    rng = random.Random(seed)
+    board = fleet.board_model(grid_size)
+    for name, length in fleet_spec:
+        board.add_ship(ShipModel(name, length))
+
+    results = []
+    with ReplayWriter(path, snapshot_every) as writer:
+        for _ in range(games):
+            board.reset()
+            board.random_layout(rng)
+            writer.start_game(grid_size, fleet_spec)
+            writer.place_all(0, board)
+
+            shooter = make_shooter(grid_size, rng)
+            remaining = sum(length for _, length in fleet_spec)
+            shots = 0
+            while remaining > 0:
+                column, row = shooter.choose(board)
+                ship = board.guess(column, row)
+                writer.guess(0, column, row)
+                shooter.observe(column, row, ship)
+                shots += 1
+                if ship is not None:
+                    remaining -= 1
+            results.append(shots)
+
+    return results
@@ -0,0 +1,206 @@
+import os
+
+from engine import DEFAULT_FLEET
+from replay import read_varint, write_varint
+
+# a saved game starts with these bytes and a format version
+MAGIC = b'BSSV'
+VERSION = 1
+
+# the game states and computer opponents a save can hold, stored by their
+# position in these lists
+STATES = ('setup', 'ready', 'player turn', 'computer turn', 'waiting',
+          'game over')
+COMPUTERS = ('density', 'montecarlo')
+
+
+class SavedBoard:
+
+    def __init__(self, view_column=0, view_row=0):
+        """Holds what is needed to put a board back the way it was: where its
+        view was scrolled to, every ship and every guess made on it.
+        """
+
+        self.view_column = view_column
+        self.view_row = view_row
+
+        # a (position, horizontal, show, locked) for each ship, where
+        # position is the (column, row) of its top left cell, or None if it
+        # isn't on the board
+        self.ships = []
+
+        # the index of every cell that was guessed, in the order they were
+        # guessed. cells marked around sunk ships are left out, since they
+        # are marked again when the guesses are made again
+        self.shots = []
+
+
+class SavedGame:
+
+    def __init__(self, grid_size=10, fleet_spec=DEFAULT_FLEET):
+        """Holds the whole state of a game between the player and the
+        computer, for saving it as bytes with dumps and loading it with
+        loads.
+        """
+
+        self.grid_size = grid_size
+        self.fleet_spec = tuple(fleet_spec)
+
+        self.state = 'setup'
+        self.first_turn = True
+        self.tile_clicked = False
+        self.turn_length = 1
+
+        # the state the game moves on to once a turn has finished, and the
+        # message shown then, if it was saved while waiting between turns
+        self.next_state = None
+        self.message = ''
+
+        # the text under the boards
+        self.text = ''
+
+        # the computer is made again from its seed and then shown its
+        # guesses again, which rebuilds what it knew
+        self.computer = 'density'
+        self.computer_seed = 0
+
+        self.boards = [SavedBoard(), SavedBoard()]
+
+
+def write_text(out, text):
+    """Appends a string to a bytearray with its length in front."""
+
+    text = text.encode()
+    write_varint(out, len(text))
+    out += text
+
+
+def read_text(data, pos):
+    """Returns a string written by write_text and the position after it."""
+
+    size, pos = read_varint(data, pos)
+    if pos + size > len(data):
+        raise ValueError('saved game is cut off')
+    return bytes(data[pos:pos + size]).decode(), pos + size
+
+
+def dumps(game):
+    """Returns a SavedGame as bytes."""
+
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+
+    gs = game.grid_size
+    write_varint(out, gs)
+    write_varint(out, len(game.fleet_spec))
+    for name, length in game.fleet_spec:
+        write_varint(out, length)
+        write_text(out, name)
+
+    out.append(STATES.index(game.state))
+    out.append(game.first_turn | game.tile_clicked << 1)
+    write_varint(out, game.turn_length)
+    if game.next_state == None:
+        out.append(0)
+    else:
+        out.append(STATES.index(game.next_state) + 1)
+    write_text(out, game.message)
+    write_text(out, game.text)
+
+    out.append(COMPUTERS.index(game.computer))
+    write_varint(out, game.computer_seed)
+
+    for board in game.boards:
+        write_varint(out, board.view_column)
+        write_varint(out, board.view_row)
+        for position, horizontal, show, locked in board.ships:
+            out.append(horizontal | show << 1 | locked << 2)
+            if position == None:
+                write_varint(out, 0)
+            else:
+                column, row = position
+                write_varint(out, column * gs + row + 1)
+        write_varint(out, len(board.shots))
+        for i in board.shots:
+            write_varint(out, i)
+
+    return bytes(out)
+
+
+def loads(data):
+    """Returns the SavedGame in some bytes made by dumps.
+    Raises ValueError if they aren't a saved game.
+    """
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('not a saved game')
+    if len(data) <= len(MAGIC):
+        raise ValueError('saved game is cut off')
+    if data[len(MAGIC)] != VERSION:
+        raise ValueError(f'unsupported saved game version '
+                         f'{data[len(MAGIC)]}')
+
+    try:
+        pos = len(MAGIC) + 1
+        gs, pos = read_varint(data, pos)
+        if gs == 0:
+            raise ValueError('saved game has no grid')
+        count, pos = read_varint(data, pos)
+        fleet_spec = []
+        for _ in range(count):
+            length, pos = read_varint(data, pos)
+            name, pos = read_text(data, pos)
+            fleet_spec.append((name, length))
+
+        game = SavedGame(gs, fleet_spec)
+        game.state = STATES[data[pos]]
+        flags = data[pos + 1]
+        game.first_turn = flags & 1 == 1
+        game.tile_clicked = flags & 2 == 2
+        game.turn_length, pos = read_varint(data, pos + 2)
+        if data[pos]:
+            game.next_state = STATES[data[pos] - 1]
+        game.message, pos = read_text(data, pos + 1)
+        game.text, pos = read_text(data, pos)
+
+        game.computer = COMPUTERS[data[pos]]
+        game.computer_seed, pos = read_varint(data, pos + 1)
+
+        for board in game.boards:
+            board.view_column, pos = read_varint(data, pos)
+            board.view_row, pos = read_varint(data, pos)
+            for _ in range(count):
+                flags = data[pos]
+                n, pos = read_varint(data, pos + 1)
+                position = None
+                if n:
+                    position = divmod(n - 1, gs)
+                board.ships.append((position, flags & 1 == 1,
+                                    flags & 2 == 2, flags & 4 == 4))
+            shots, pos = read_varint(data, pos)
+            for _ in range(shots):
+                i, pos = read_varint(data, pos)
+                board.shots.append(i)
+    except IndexError:
+        # also where a damaged state or computer number ends up
+        raise ValueError('saved game is cut off or damaged')
+
+    return game
+
+
+def save(path, game):
+    """Writes a SavedGame to a file. The old file is only replaced once the
+    new one is complete, so a crash part way through leaves the last save.
+    """
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(dumps(game))
+    os.replace(temporary, path)
+
+
+def load(path):
+    """Returns the SavedGame in a file."""
+
+    with open(path, 'rb') as f:
+        return loads(f.read())
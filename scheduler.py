@@ -0,0 +1,50 @@
+import heapq
+import itertools
+import time
+
+
+class Scheduler:
+
+    def __init__(self, clock=time.monotonic):
+        """Sets up an empty queue of delayed calls. clock is called to get
+        the current time in seconds.
+        """
+
+        self.clock = clock
+        self.queue = []
+
+        # breaks ties so calls that are due at the same time run in the order
+        # they were queued
+        self.counter = itertools.count()
+
+    def after(self, delay, func, *args):
+        """Queues a function to be called with the given arguments once a
+        number of seconds have passed.
+        """
+
+        heapq.heappush(self.queue,
+                       (self.clock() + delay, next(self.counter), func, args))
+
+    def clear(self):
+        """Cancels every queued call, including ones that are due in the
+        same run as a call that clears them.
+        """
+
+        self.queue = []
+
+    def run(self):
+        """Makes every call that is due, in the order they are due. Calls
+        queued while running are made too if they are already due.
+        Returns how many calls were made.
+        """
+
+        now = self.clock()
+        calls = 0
+
+        # a call can clear the queue, so it is looked up again each time
+        while self.queue and self.queue[0][0] <= now:
+            _, _, func, args = heapq.heappop(self.queue)
+            func(*args)
+            calls += 1
+
+        return calls
@@ -0,0 +1,419 @@
+import argparse
+import asyncio
+import collections
+import json
+import random
+import sys
+import time
+
+import fleet
+from engine import ShipModel, fleet_fits
+from game import ComputerPlayer
+
+# the biggest grid a match can be played on, to keep a match's memory use
+# bounded
+MAX_GRID = 1000
+
+# the most copies of the fleet a match can be played with, for the same
+# reason
+MAX_FLEETS = 100
+
+# how many seconds the computer may spend choosing each guess. its turn is
+# taken on the event loop, where every other match waits for it, so it
+# gets much less time than in the game. on grids small enough for the
+# targeter's tables it takes microseconds anyway
+TIME_LIMIT = 0.001
+
+
+def encode(message):
+    """Returns a message as a line of JSON."""
+
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+def decode(line):
+    """Returns the message in a line of JSON. Raises ValueError if it isn't
+    one.
+    """
+
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError('a message must be a JSON object')
+    return message
+
+
+class Player:
+
+    def __init__(self, writer):
+        """Sets up a player connected to the server."""
+
+        self.writer = writer
+        self.match = None
+        self.side = None
+
+        # the ships the player sent while waiting for an opponent, placed
+        # once they are matched
+        self.layout = None
+
+    def send(self, message):
+        """Sends a message to the player."""
+
+        self.writer.write(encode(message))
+
+    def opponent_moved(self, column, row):
+        """Tells the player where their opponent guessed."""
+
+        self.send({'type': 'incoming', 'column': column, 'row': row})
+
+    def game_over(self, won):
+        """Tells the player the match is over."""
+
+        self.send({'type': 'over', 'won': won})
+
+
+class ComputerSide:
+
+    def __init__(self, match, side, rng=random):
+        """Sets up the computer's side of a match, with its ships at random
+        positions and a density targeter to guess with.
+        """
+
+        self.match = match
+        self.side = side
+        match.boards[side].random_layout(rng)
+        match.ready[side] = True
+
+        lengths = [length for _, length in match.fleet_spec]
+        self.computer = ComputerPlayer('density', rng.getrandbits(32),
+                                       match.grid_size, lengths, TIME_LIMIT)
+        self.computer.rebuild(match.boards[1 - side])
+
+    def send(self, message):
+        """The computer keeps track of its own guesses, so it isn't sent
+        anything.
+        """
+
+        pass
+
+    def opponent_moved(self, column, row):
+        """Takes the computer's turn straight after the player's."""
+
+        if self.match.turn == self.side:
+            self.take_turn()
+
+    def game_over(self, won):
+        """Nothing happens to the computer when a match ends."""
+
+        pass
+
+    def take_turn(self):
+        """Guesses the cell the computer chooses."""
+
+        board = self.match.boards[1 - self.side]
+        column, row = self.computer.choose(board)
+        ship = self.match.guess(self.side, column, row)
+        self.computer.observe(column, row, ship)
+
+
+class Match:
+
+    def __init__(self, grid_size, fleet_spec, rng=random):
+        """Sets up a match between two sides, each with its own board.
+        Side 0 and side 1 take turns guessing on the other side's board.
+        """
+
+        self.grid_size = grid_size
+        self.fleet_spec = fleet_spec
+        self.rng = rng
+        self.players = [None, None]
+
+        self.boards = []
+        for _ in range(2):
+            board = fleet.board_model(grid_size)
+            for name, length in fleet_spec:
+                board.add_ship(ShipModel(name, length))
+            self.boards.append(board)
+
+        self.ready = [False, False]
+
+        # whose turn it is, or None before the match starts and after it ends
+        self.turn = None
+        self.over = False
+
+    def set_layout(self, side, layout):
+        """Places a side's ships from a list of [column, row, horizontal].
+        Raises ValueError if the layout is not valid.
+        """
+
+        board = self.boards[side]
+        if self.turn != None or self.over:
+            raise ValueError('the match has already started')
+        if len(layout) != len(board.ships):
+            raise ValueError(f'expected {len(board.ships)} ships')
+
+        board.reset()
+        try:
+            for ship, (column, row, horizontal) in zip(board.ships, layout):
+                board.place_ship(ship, int(column), int(row),
+                                 bool(horizontal))
+        except (TypeError, ValueError):
+            board.reset()
+            raise ValueError('the ships are not in valid positions')
+
+        self.ready[side] = True
+        if self.ready[0] and self.ready[1]:
+            self.start()
+
+    def start(self):
+        """Picks a side at random to go first and tells both sides the match
+        has started.
+        """
+
+        self.turn = self.rng.randrange(2)
+        for side, player in enumerate(self.players):
+            player.send({'type': 'start', 'your_turn': side == self.turn})
+
+        if isinstance(self.players[self.turn], ComputerSide):
+            self.players[self.turn].take_turn()
+
+    def guess(self, side, column, row):
+        """Makes a side's guess on the other side's board, tells both sides
+        what happened and passes the turn on. Returns the ship that was hit,
+        or None for a miss.
+        Raises ValueError if it isn't that side's turn or the guess isn't
+        allowed.
+        """
+
+        if self.turn != side:
+            raise ValueError('it is not your turn')
+
+        board = self.boards[1 - side]
+        if not (isinstance(column, int) and isinstance(row, int)
+                and board.in_bounds(column, row)):
+            raise ValueError('that cell is not on the board')
+        ship = board.guess(column, row)
+
+        sunk = None
+        if ship != None and ship.sunk:
+            sunk = [board.ships.index(ship), ship.column, ship.row,
+                    ship.horizontal]
+        self.players[side].send({'type': 'result', 'column': column,
+                                 'row': row, 'hit': ship != None,
+                                 'sunk': sunk})
+
+        won = sunk != None and board.all_sunk()
+        if won:
+            self.turn = None
+        else:
+            self.turn = 1 - side
+        self.players[1 - side].opponent_moved(column, row)
+        if won:
+            self.finish(side)
+
+        return ship
+
+    def finish(self, winner):
+        """Ends the match and tells both sides who won."""
+
+        self.over = True
+        for side, player in enumerate(self.players):
+            player.game_over(side == winner)
+
+
+def computer_match(grid_size, fleet_spec, seed):
+    """Returns a new Match with the computer on side 1, its ships laid out
+    and its targeter made, with random choices made from a seed. Raises
+    ValueError if no layout for the fleet was found.
+    """
+
+    rng = random.Random(seed)
+    match = Match(grid_size, fleet_spec, rng)
+    match.players[1] = ComputerSide(match, 1, rng)
+    return match
+
+
+class Server:
+
+    def __init__(self, rng=random):
+        """Sets up a server with no matches. Players who want to play another
+        player wait for one with the same grid size and fleet.
+        """
+
+        self.rng = rng
+        self.waiting = {}
+        self.connections = 0
+        self.matches = 0
+
+        # how long each of the last guesses took to handle, in seconds
+        self.move_times = collections.deque(maxlen=100000)
+
+    async def handle(self, reader, writer):
+        """Reads messages from a player until they disconnect."""
+
+        player = Player(writer)
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # the line was longer than the stream's limit. what
+                    # follows can't be trusted to start a new message
+                    player.send({'type': 'error',
+                                 'message': 'the message is too long'})
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    await self.dispatch(player, decode(line))
+                except (ValueError, KeyError, TypeError) as error:
+                    player.send({'type': 'error', 'message': str(error)})
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            self.leave(player)
+            writer.close()
+
+    async def dispatch(self, player, message):
+        """Acts on a message from a player."""
+
+        kind = message['type']
+        if kind == 'guess':
+            if player.match == None:
+                raise ValueError('you are not in a match')
+            start = time.perf_counter()
+            player.match.guess(player.side, message['column'],
+                               message['row'])
+            self.move_times.append(time.perf_counter() - start)
+        elif kind == 'layout':
+            if player.match != None:
+                player.match.set_layout(player.side, message['ships'])
+            elif player in self.waiting.values():
+                player.layout = message['ships']
+            else:
+                raise ValueError('you are not in a match')
+        elif kind == 'join':
+            await self.join(player, message.get('opponent', 'computer'),
+                            message.get('grid', 10),
+                            message.get('fleets', 1))
+        else:
+            raise ValueError(f'unknown message type {kind!r}')
+
+    async def join(self, player, opponent, grid_size, fleets):
+        """Starts a new match for a player against the computer, or against
+        the next player who wants the same kind of match. Leaves any match
+        the player was already in.
+        """
+
+        if not (isinstance(grid_size, int) and isinstance(fleets, int)
+                and 5 <= grid_size <= MAX_GRID
+                and 1 <= fleets <= MAX_FLEETS):
+            raise ValueError('not a valid grid size or fleet')
+        if opponent not in ('computer', 'player'):
+            raise ValueError(f'unknown opponent {opponent!r}')
+
+        fleet_spec = fleet.repeat_fleet(fleets)
+        if not fleet_fits(grid_size, [length for _, length in fleet_spec]):
+            raise ValueError('the fleet does not fit on the board')
+
+        self.leave(player)
+
+        if opponent == 'computer':
+            # laying out the computer's ships and making its targeter take a
+            # while on a big grid, so they are done in another thread to keep
+            # the other matches going
+            seed = self.rng.getrandbits(32)
+            loop = asyncio.get_running_loop()
+            match = await loop.run_in_executor(None, computer_match,
+                                               grid_size, fleet_spec, seed)
+            self.seat(match, player, 0)
+            self.matches += 1
+            player.send({'type': 'matched', 'opponent': 'computer'})
+            return
+
+        key = (grid_size, fleets)
+        other = self.waiting.pop(key, None)
+        if other == None:
+            self.waiting[key] = player
+            player.send({'type': 'waiting'})
+            return
+
+        match = Match(grid_size, fleet_spec, self.rng)
+        self.seat(match, other, 0)
+        self.seat(match, player, 1)
+        self.matches += 1
+        for p in (other, player):
+            p.send({'type': 'matched', 'opponent': 'player'})
+
+        # place the ships of anyone who sent them while waiting
+        for side, p in enumerate((other, player)):
+            layout = p.layout
+            p.layout = None
+            if layout != None:
+                try:
+                    match.set_layout(side, layout)
+                except ValueError as error:
+                    p.send({'type': 'error', 'message': str(error)})
+
+    def seat(self, match, player, side):
+        """Puts a player on one side of a match."""
+
+        match.players[side] = player
+        player.match = match
+        player.side = side
+
+    def leave(self, player):
+        """Takes a player out of their match, or out of the queue for one.
+        Their opponent is told they left if the match wasn't over.
+        """
+
+        for key, other in list(self.waiting.items()):
+            if other is player:
+                del self.waiting[key]
+        player.layout = None
+
+        match = player.match
+        if match == None:
+            return
+        player.match = None
+
+        if not match.over:
+            match.over = True
+            match.turn = None
+            other = match.players[1 - player.side]
+            if isinstance(other, Player):
+                other.send({'type': 'left'})
+                other.match = None
+
+
+async def serve(host='127.0.0.1', port=8765):
+    """Runs a server until it is stopped."""
+
+    server = Server()
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f'listening on {host}:{port}')
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    """Runs a server from the command line."""
+
+    parser = argparse.ArgumentParser(
+        description='Host battleship matches over TCP. Each message is a '
+                    'line of JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
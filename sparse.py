@@ -0,0 +1,108 @@
+import random
+
+from engine import BoardModel, cells_around, fleet_fits
+
+
+class Occupants(dict):
+    """The ship in each occupied cell, keyed by flat index. Empty cells give
+    None, so it can stand in for BoardModel's list of occupants.
+    """
+
+    def __missing__(self, i):
+        return None
+
+
+class Neighbours:
+
+    __slots__ = ('grid_size',)
+
+    def __init__(self, grid_size):
+        """Stands in for BoardModel's table of the cells around each cell,
+        working each one out when it is asked for instead of storing them all.
+        """
+
+        self.grid_size = grid_size
+
+    def __getitem__(self, i):
+        """Returns a tuple of the indexes of the cells around a cell."""
+
+        column, row = divmod(i, self.grid_size)
+        return cells_around(self.grid_size, column, row)
+
+
+class SparseBoardModel(BoardModel):
+
+    __slots__ = ()
+
+    def __init__(self, grid_size=10):
+        """Sets up an empty board that only stores the cells ships are in,
+        for grids far too big to keep a list entry per cell. Guesses are
+        still kept in a bytearray, which is one byte per cell.
+        """
+
+        BoardModel.__init__(self, grid_size)
+        self.occupant = Occupants()
+
+    def neighbour_table(self):
+        """Returns an object that works out the cells around a cell when
+        asked.
+        """
+
+        return Neighbours(self.grid_size)
+
+    def reset(self):
+        """Takes every ship off the board and clears every guess."""
+
+        self.occupant = Occupants()
+        self.guessed = bytearray(self.size)
+        self.clear_counts()
+
+        for ship in self.ships:
+            ship.reset()
+
+    def remove_ship(self, ship):
+        """Takes a ship off the board. Does nothing if it isn't on the board.
+        """
+
+        if ship.cells:
+            self.ships_placed -= 1
+            self.cells_left -= ship.length - ship.hits
+
+        for i in ship.cells:
+            self.occupant.pop(i, None)
+
+        ship.column = None
+        ship.row = None
+        ship.cells = ()
+        ship.halo = ()
+
+    def random_layout(self, rng=random, tries=100):
+        """Places every ship in the fleet at a random valid position.
+        Each ship tries random positions until one is valid, which is the
+        same as choosing uniformly from the valid positions and is quick
+        while most of the board is empty. If a ship fails that many times in
+        a row the whole layout is made by BoardModel.random_layout instead.
+        Raises ValueError if the fleet cannot fit at all.
+        """
+
+        lengths = [ship.length for ship in self.ships]
+        if not fleet_fits(self.grid_size, lengths):
+            raise ValueError('the fleet does not fit on the board')
+
+        for ship in self.ships:
+            self.remove_ship(ship)
+
+        gs = self.grid_size
+        random_number = rng.random
+
+        for ship in self.ships:
+            for _ in range(tries):
+                horizontal = random_number() < 0.5
+                column = int(random_number() * gs)
+                row = int(random_number() * gs)
+                if self.can_place(ship, column, row, horizontal):
+                    self.place_ship(ship, column, row, horizontal)
+                    break
+            else:
+                BoardModel.random_layout(self, rng)
+                return
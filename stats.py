@@ -0,0 +1,8 @@
+def percentile(values, p):
+    """Returns the p-th percentile of a sorted list (nearest rank)."""
+
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1,
+                      int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
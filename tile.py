@@ -10,54 +10,57 @@ class Tile:
     
     def __init__(self, board, c=0, r=0, s=0):
         """Gives the tile a column and a row.
-        Initializes a Rect and a Surface to draw the tile in.
+        Initializes a Rect to keep track of the tile's position.
         Sets up varibales to control its interaction with the player.
         """
         
         self.board = board
         self.column = c
         self.row = r
+        self.index = c * board.grid_size + r
         self.size = s
         
         self.rect = pygame.Rect(0, 0, s, s)
-        self.surface = pygame.Surface((s, s))
-        self.color = self.BLUE
         
+        # what is in the tile is asked of the board's model when it is needed
         self.hovered = False
-        self.ship = None
-        self.adjacent_ships = []
-        self.guessed = False
-        self.pin_color = None
         
     def reset(self):
         """Reverts the tile to its original state."""
         
-        self.hovered = False
-        self.ship = None
-        self.adjacent_ships = []
-        self.guessed = False
-        self.pin_color = None
+        self.set_hovered(False)
+        
+    @property
+    def guessed(self):
+        """Returns True if the tile has been guessed."""
+        
+        return self.board.model.guessed[self.index] == 1
+    
+    @property
+    def pin_color(self):
+        """Returns red if there is a ship in the tile and grey otherwise."""
+        
+        if self.board.model.occupant[self.index] != None:
+            return self.RED
+        return self.GREY
         
     def set_pos(self, grid):
         """Sets the position of the tile on the screen based on the position of
         the grid of the board the tile belongs to and the column/row the tile
-        is in.
+        is in, counted from the top left tile in view.
         """
         
-        self.rect.update(grid.x + (self.column * self.size),
-                         grid.y + (self.row * self.size), self.size, self.size)
+        self.rect.update(grid.x + (self.column - self.board.view_column)
+                         * self.size,
+                         grid.y + (self.row - self.board.view_row) * self.size,
+                         self.size, self.size)
         
     def check_hovered(self, ship):
         """Darkens the color of the tile if a ship is hovering over more than
         half of it.
         """
         
-        if self.overlaps(ship) and ship.dragged:
-            self.hovered = True
-            self.color = self.DARK_BLUE
-        else:
-            self.hovered = False
-            self.color = self.BLUE
+        self.set_hovered(self.overlaps(ship) and ship.dragged)
             
     def overlaps(self, ship):
         """Returns True if a ship is hovering over more than half of the tile.
@@ -74,41 +77,69 @@ class Tile:
     def cancel_hovered(self):
         """Reverts the tile to its original color."""
         
-        self.hovered = False
-        self.color = self.BLUE
+        self.set_hovered(False)
+        
+    def set_hovered(self, h):
+        """Darkens the tile or reverts its color, and tells the board to
+        redraw it if that changed.
+        """
+        
+        if h != self.hovered:
+            self.hovered = h
+            self.board.redraw_tiles.add(self.index)
         
     def check_clicked(self, coords):
         """Returns true if the tile is clicked."""
         
         return self.rect.collidepoint(coords)
     
-    def guess(self):
-        """Returns True and changes the tile color to red if it is a hit.
-        Also puts a red circle on the ship where the hit is.
-        Returns False and changes the tile color to grey if it is a miss.
-        """
+    def sprite(self):
+        """Returns the picture of the tile in its current state."""
         
-        self.guessed = True
-        if self.ship != None:
-            self.ship.hit(self)
-            self.pin_color = self.RED
-            return True
-        else:
-            self.pin_color = self.GREY
-            return False
-    
-    def draw(self, surf):
-        """Draws the tile on the screen."""
-        
-        self.surface.fill(self.color)
-        if self.guessed:
-            pygame.draw.circle(self.surface, self.pin_color, (self.size // 2, self.size // 2), self.size // 4)
-        pygame.draw.rect(self.surface, 'black', pygame.Rect(0, 0, self.size, self.size), 1)
-        surf.blit(self.surface, (self.column * self.size, self.row * self.size))
+        return self.board.sprite_at(self.index)
         
     def __str__(self):
         """Returns a string the represent the tile in the format {column}{row}.
         (Example: A1)
         """
         
-        return chr(65 + self.column) + str(self.row + 1)
+        return column_label(self.column) + str(self.row + 1)
+
+
+def column_label(column):
+    """Returns the letters for a column: A to Z, then AA, AB and so on."""
+    
+    label = ''
+    column += 1
+    while column > 0:
+        column, letter = divmod(column - 1, 26)
+        label = chr(65 + letter) + label
+    return label
+
+
+# the picture of a tile in each state, drawn once for each tile size and
+# shared by every tile of that size
+sprites = {}
+
+def tile_sprites(size):
+    """Returns a dictionary of the pictures of a tile of a certain size when
+    it is water, hovered over by a ship, a hit, and a miss.
+    """
+    
+    if size not in sprites:
+        drawn = {}
+        for name, color, pin_color in (('water', Tile.BLUE, None),
+                                       ('hovered', Tile.DARK_BLUE, None),
+                                       ('hit', Tile.BLUE, Tile.RED),
+                                       ('miss', Tile.BLUE, Tile.GREY)):
+            surface = pygame.Surface((size, size))
+            surface.fill(color)
+            if pin_color != None:
+                pygame.draw.circle(surface, pin_color, (size // 2, size // 2),
+                                   size // 4)
+            pygame.draw.rect(surface, 'black', pygame.Rect(0, 0, size, size),
+                             1)
+            drawn[name] = surface
+        sprites[size] = drawn
+        
+    return sprites[size]
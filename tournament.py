@@ -0,0 +1,232 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import ai
+import fleet
+from engine import DEFAULT_FLEET, BoardModel, RandomShooter
+from stats import percentile
+
+# how to make each strategy from a grid size, a list of ship lengths and a
+# random number generator
+STRATEGIES = {
+    'random': lambda gs, lengths, rng: RandomShooter(gs, rng),
+    'heuristic': lambda gs, lengths, rng: ai.HeuristicTargeter(gs, lengths,
+                                                               rng),
+    'density': lambda gs, lengths, rng: ai.DensityTargeter(gs, lengths, rng),
+    'montecarlo': lambda gs, lengths, rng: ai.MonteCarloTargeter(
+        gs, lengths, rng, time_limit=0.05),
+}
+
+# strategies that run their own process pool, so their games are played in
+# the main process instead of being handed to workers
+USES_POOL = ('montecarlo',)
+
+
+def play_chunk(strategy, grid_size, fleet_spec, seed, games):
+    """Plays a number of games with one strategy on layouts made from a seed.
+    Every strategy gets the same layouts for the same seed.
+    Returns a list of the shots each game took and a list of how long each
+    move took the strategy, choosing it and being told what it hit, in
+    seconds.
+    """
+
+    layouts = fleet.random_layouts(games, grid_size, fleet_spec, seed)
+    lengths = [length for _, length in fleet_spec]
+
+    # the strategy's random numbers come from a different seed to the
+    # layouts', so they don't follow the same sequence
+    rng = random.Random(f'{seed} strategy')
+    make = STRATEGIES[strategy]
+    clock = time.perf_counter
+
+    board = BoardModel(grid_size)
+    board.add_fleet(fleet_spec)
+
+    shots = []
+    latencies = []
+    for layout in layouts:
+        board.reset()
+        fleet.apply_layout(board, layout)
+        shooter = make(grid_size, lengths, rng)
+
+        remaining = sum(lengths)
+        n = 0
+        while remaining > 0:
+            start = clock()
+            column, row = shooter.choose(board)
+            elapsed = clock() - start
+
+            ship = board.guess(column, row)
+
+            # strategies that keep counts up to date do much of their work
+            # when they are told the result, so that is part of the move
+            start = clock()
+            shooter.observe(column, row, ship)
+            latencies.append(elapsed + clock() - start)
+            n += 1
+            if ship is not None:
+                remaining -= 1
+
+        shots.append(n)
+
+    return shots, latencies
+
+
+def summarize(shots, latencies, seconds):
+    """Returns a dictionary describing the results for one strategy."""
+
+    shots = sorted(shots)
+    latencies = sorted(latencies)
+
+    histogram = {}
+    for n in shots:
+        histogram[n] = histogram.get(n, 0) + 1
+
+    return {
+        'games': len(shots),
+        'seconds': seconds,
+        'games_per_second': len(shots) / seconds if seconds else None,
+        'shots': {
+            'mean': sum(shots) / len(shots),
+            'min': shots[0],
+            'p10': percentile(shots, 10),
+            'p50': percentile(shots, 50),
+            'p90': percentile(shots, 90),
+            'p99': percentile(shots, 99),
+            'max': shots[-1],
+            'histogram': {str(n): count
+                          for n, count in sorted(histogram.items())},
+        },
+        'latency_ms': {
+            'moves': len(latencies),
+            'mean': 1000 * sum(latencies) / len(latencies),
+            'p50': 1000 * percentile(latencies, 50),
+            'p95': 1000 * percentile(latencies, 95),
+            'p99': 1000 * percentile(latencies, 99),
+            'max': 1000 * latencies[-1],
+        },
+    }
+
+
+def code_version():
+    """Returns the git commit of the code being measured, or None if it
+    can't be found.
+    """
+
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_tournament(strategies, games, grid_size=10, fleet_spec=DEFAULT_FLEET,
+                   seed=0, workers=None, chunk_size=50):
+    """Plays a number of games with each strategy, spread over a pool of
+    worker processes, and returns the results as a dictionary.
+    """
+
+    workers = workers or os.cpu_count() or 1
+
+    # split the games into chunks with their own seeds, the same for every
+    # strategy
+    chunks = []
+    for start in range(0, games, chunk_size):
+        chunks.append((seed * 1000003 + start, min(chunk_size, games - start)))
+
+    results = {
+        'version': code_version(),
+        'python': platform.python_version(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {
+            'games': games,
+            'grid_size': grid_size,
+            'fleet': [list(ship) for ship in fleet_spec],
+            'seed': seed,
+            'workers': workers,
+        },
+        'strategies': {},
+    }
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        for strategy in strategies:
+            start = time.perf_counter()
+            shots = []
+            latencies = []
+
+            if strategy in USES_POOL:
+                outcomes = [play_chunk(strategy, grid_size, fleet_spec,
+                                       chunk_seed, count)
+                            for chunk_seed, count in chunks]
+            else:
+                outcomes = executor.map(
+                    play_chunk, [strategy] * len(chunks),
+                    [grid_size] * len(chunks), [fleet_spec] * len(chunks),
+                    [chunk_seed for chunk_seed, _ in chunks],
+                    [count for _, count in chunks])
+
+            for chunk_shots, chunk_latencies in outcomes:
+                shots.extend(chunk_shots)
+                latencies.extend(chunk_latencies)
+
+            results['strategies'][strategy] = summarize(
+                shots, latencies, time.perf_counter() - start)
+
+    ai.shutdown_pool()
+    return results
+
+
+def main(argv=None):
+    """Runs a tournament from the command line, prints a summary and writes
+    the full results to a JSON file.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Measure how many shots each computer strategy takes to '
+                    'win and how fast it is.')
+    parser.add_argument('strategies', nargs='*',
+                        default=['random', 'heuristic', 'density'],
+                        help='strategies to play: '
+                             + ', '.join(STRATEGIES))
+    parser.add_argument('-n', '--games', type=int, default=1000,
+                        help='games per strategy (default 1000)')
+    parser.add_argument('-g', '--grid-size', type=int, default=10)
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('-o', '--output', default='tournament.json',
+                        help='where to write the JSON results')
+    args = parser.parse_args(argv)
+
+    for strategy in args.strategies:
+        if strategy not in STRATEGIES:
+            parser.error(f'unknown strategy {strategy!r}')
+
+    results = run_tournament(args.strategies, args.games, args.grid_size,
+                             DEFAULT_FLEET, args.seed, args.workers)
+
+    print(f"{'strategy':<12}{'mean':>8}{'p50':>6}{'p90':>6}{'max':>6}"
+          f"{'move p50 ms':>13}{'move p99 ms':>13}{'games/s':>10}")
+    for name, result in results['strategies'].items():
+        shots = result['shots']
+        latency = result['latency_ms']
+        print(f"{name:<12}{shots['mean']:>8.2f}{shots['p50']:>6}"
+              f"{shots['p90']:>6}{shots['max']:>6}{latency['p50']:>13.3f}"
+              f"{latency['p99']:>13.3f}{result['games_per_second']:>10.1f}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])